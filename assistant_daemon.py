@@ -0,0 +1,357 @@
+import os
+import sys
+import json
+import time
+import secrets
+import threading
+import subprocess
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import autosave
+import model_backends
+import workspace_cache
+
+
+# --- Shared background daemon ---
+# Optional (ASSISTANT_DAEMON=1): one background process per user owns the
+# WorkspaceCache (project scans, chat lists, thumbnails, task index) and the model
+# request queue, and every app window talks to it over a local socket. A second
+# window therefore starts from warm caches instead of rescanning the projects.
+#
+# The daemon listens on 127.0.0.1 with a random port and a random auth key, both
+# written to a state file only the current user can read. Requests are pickled
+# (method, args) tuples; replies are ("ok", value) or ("error", exception).
+# Without clients the daemon exits after IDLE_TIMEOUT.
+
+STATE_FILE = os.path.join(os.path.expanduser("~"), ".projekt_assistent", "daemon.json")
+PROTOCOL_VERSION = 2
+
+START_TIMEOUT = 10.0
+IDLE_TIMEOUT = 30 * 60
+# Model requests of all windows share these slots; the rest wait in line
+MODEL_CONCURRENCY = 2
+
+WORKSPACE_METHODS = (
+    "projects", "scan_project", "chat_files", "last_modified_file",
+    "thumbnail", "peek_thumbnail", "put_thumbnail", "invalidate", "refresh_tasks", "query_tasks",
+)
+
+
+class DaemonError(Exception):
+    pass
+
+
+# --- Server ---
+
+class AssistantDaemon:
+    def __init__(self, router, cache=None, state_file=STATE_FILE):
+        self.cache = cache or workspace_cache.WorkspaceCache()
+        # The same model name may be served by several backends, e.g. local and Gemini
+        self.backends = {(route.kind, route.model): route.backend for route in router.routes}
+        self.model_slots = threading.BoundedSemaphore(MODEL_CONCURRENCY)
+        self.state_file = state_file
+        self.authkey = secrets.token_bytes(32)
+        self.listener = Listener(("127.0.0.1", 0), authkey=self.authkey)
+        self.lock = threading.Lock()
+        self.clients = 0
+        self.last_active = time.monotonic()
+        self.stopped = False
+
+    def write_state(self):
+        # atomic_write creates the file via mkstemp, i.e. readable by the owner only
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        host, port = self.listener.address
+        autosave.atomic_write(self.state_file, json.dumps({
+            "version": PROTOCOL_VERSION,
+            "pid": os.getpid(),
+            "host": host,
+            "port": port,
+            "authkey": self.authkey.hex(),
+        }))
+
+    def remove_state(self):
+        state = read_state(self.state_file)
+        if state and state.get("pid") == os.getpid():
+            try:
+                os.remove(self.state_file)
+            except OSError:
+                pass
+
+    def serve_forever(self):
+        self.write_state()
+        threading.Thread(target=self.watch_idle, name="daemon-idle", daemon=True).start()
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except (AuthenticationError, EOFError, ConnectionError):
+                    continue
+                if self.stopped:
+                    conn.close()
+                    break
+                threading.Thread(target=self.serve_connection, args=(conn,), name="daemon-client", daemon=True).start()
+        finally:
+            self.listener.close()
+            self.remove_state()
+
+    def stop(self):
+        # Closing the listener from another thread does not interrupt accept(),
+        # so wake it up with one last connection
+        self.stopped = True
+        try:
+            Client(self.listener.address, authkey=self.authkey).close()
+        except (OSError, EOFError, AuthenticationError):
+            pass
+
+    def watch_idle(self):
+        while not self.stopped:
+            time.sleep(60)
+            with self.lock:
+                idle = self.clients == 0 and time.monotonic() - self.last_active > IDLE_TIMEOUT
+            if idle:
+                self.stop()
+
+    def serve_connection(self, conn):
+        with self.lock:
+            self.clients += 1
+        try:
+            while True:
+                try:
+                    method, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                with self.lock:
+                    self.last_active = time.monotonic()
+                try:
+                    reply = ("ok", self.handle(method, args))
+                except Exception as e:
+                    reply = ("error", e)
+                try:
+                    conn.send(reply)
+                except (OSError, EOFError):
+                    return
+                except Exception as e:
+                    # The exception (or value) could not be pickled
+                    conn.send(("error", DaemonError(f"{type(e).__name__}: {e}")))
+        finally:
+            conn.close()
+            with self.lock:
+                self.clients -= 1
+                self.last_active = time.monotonic()
+
+    def handle(self, method, args):
+        if method == "ping":
+            return PROTOCOL_VERSION
+        if method == "generate":
+            return self.generate(*args)
+        if method == "shutdown":
+            self.stop()
+            return True
+        if method in WORKSPACE_METHODS:
+            return getattr(self.cache, method)(*args)
+        raise DaemonError(f"Unbekannte Anfrage: {method}")
+
+    def generate(self, kind, model, history, prompt):
+        backend = self.backends.get((kind, model))
+        if backend is None:
+            raise model_backends.ModelBackendError(f"Das Modell {model} ({kind}) ist im Hintergrunddienst nicht konfiguriert.")
+        with self.model_slots:
+            return backend.generate(model, history, prompt)
+
+
+# --- Client ---
+
+class DaemonClient:
+    # Drop-in for WorkspaceCache in the app. Every thread gets its own connection,
+    # so a long model request does not block the UI's listing calls. If the daemon
+    # goes away, workspace calls fall back to a local cache.
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+        self.local = threading.local()
+        self.fallback = None
+        self.fallback_lock = threading.Lock()
+        self.task_index = DaemonTaskIndex(self)
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self.local.conn = conn
+        return conn
+
+    def drop_connection(self):
+        conn = getattr(self.local, "conn", None)
+        self.local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, method, *args):
+        # One reconnect attempt, e.g. after the daemon was restarted on the same port
+        for attempt in range(2):
+            try:
+                conn = self.connection()
+                conn.send((method, args))
+                status, value = conn.recv()
+                break
+            except (OSError, EOFError, AuthenticationError) as e:
+                self.drop_connection()
+                if attempt == 1:
+                    raise DaemonError(f"Der Hintergrunddienst ist nicht erreichbar: {e}") from e
+        if status == "error":
+            raise value
+        return value
+
+    def workspace_call(self, method, *args):
+        try:
+            return self.call(method, *args)
+        except DaemonError:
+            with self.fallback_lock:
+                if self.fallback is None:
+                    self.fallback = workspace_cache.WorkspaceCache()
+            return getattr(self.fallback, method)(*args)
+
+    def projects(self, csv_path):
+        # The daemon may run in another working directory
+        return self.workspace_call("projects", os.path.abspath(csv_path))
+
+    def scan_project(self, project_path):
+        return self.workspace_call("scan_project", project_path)
+
+    def chat_files(self, project_path):
+        return self.workspace_call("chat_files", project_path)
+
+    def last_modified_file(self, project_path):
+        return self.workspace_call("last_modified_file", project_path)
+
+    def thumbnail(self, photo_path):
+        return self.workspace_call("thumbnail", photo_path)
+
+    def peek_thumbnail(self, photo_path):
+        return self.workspace_call("peek_thumbnail", photo_path)
+
+    def put_thumbnail(self, photo_path, data):
+        return self.workspace_call("put_thumbnail", photo_path, data)
+
+    def invalidate(self, path):
+        return self.workspace_call("invalidate", path)
+
+    def create_router(self, env=None):
+        # Same routes as in local mode, but every request goes through the daemon's queue
+        backends = {}
+        routes = []
+        for spec in model_backends.load_route_specs(env):
+            kind = spec.get("backend", "gemini")
+            backend = backends.setdefault(kind, DaemonBackend(self, kind))
+            routes.append(model_backends.ModelRoute(backend, spec["model"], spec.get("cost", 1.0), spec.get("tier", 1), spec.get("latency", 5.0), kind))
+        return model_backends.ModelRouter(routes)
+
+
+class DaemonTaskIndex:
+    # The part of TaskIndex the app uses, backed by the daemon's index
+
+    def __init__(self, client):
+        self.client = client
+        self.refresh_thread = None
+
+    def refresh(self, projects):
+        return self.client.workspace_call("refresh_tasks", projects)
+
+    def refresh_in_background(self, projects, on_done=None):
+        # on_done(changed, error) is called from the worker thread, also if the
+        # refresh failed (e.g. the index cannot be written)
+        if self.refresh_thread and self.refresh_thread.is_alive():
+            return False
+
+        def worker():
+            try:
+                changed, error = self.refresh(projects), None
+            except Exception as e:
+                changed, error = False, e
+            if on_done:
+                on_done(changed, error)
+
+        self.refresh_thread = threading.Thread(target=worker, name="task-index", daemon=True)
+        self.refresh_thread.start()
+        return True
+
+    def query(self, project=None, typ=None, status=None):
+        return self.client.workspace_call("query_tasks", project, typ, status)
+
+
+class DaemonBackend(model_backends.ModelBackend):
+    name = "daemon"
+
+    def __init__(self, client, kind):
+        self.client = client
+        self.kind = kind
+
+    def generate(self, model, history, prompt):
+        try:
+            return self.client.call("generate", self.kind, model, history, prompt)
+        except DaemonError as e:
+            raise model_backends.ModelBackendError(str(e)) from e
+
+
+# --- Discovery ---
+
+def read_state(state_file=STATE_FILE):
+    try:
+        with open(state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def connect(state_file=STATE_FILE):
+    # Returns a client for the running daemon, or None
+    state = read_state(state_file)
+    if not state or state.get("version") != PROTOCOL_VERSION:
+        return None
+    try:
+        client = DaemonClient((state["host"], state["port"]), bytes.fromhex(state["authkey"]))
+        client.call("ping")
+    except (DaemonError, KeyError, ValueError):
+        return None
+    return client
+
+
+def start_daemon(env=None):
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__)], env=env, cwd=os.getcwd(),
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs,
+    )
+
+
+def connect_or_start(env=None, timeout=START_TIMEOUT):
+    # env is passed to a newly started daemon, e.g. with GEMINI_API_KEY set
+    client = connect()
+    if client:
+        return client
+    start_daemon(env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.1)
+        client = connect()
+        if client:
+            return client
+    return None
+
+
+def main():
+    router = model_backends.create_router_from_env(os.getenv("GEMINI_API_KEY"))
+    AssistantDaemon(router).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import os
+import hashlib
+import tempfile
+import threading
+
+
+# --- Autosave ---
+# AutosaveWriter owns one background thread that writes files atomically. Requests
+# for the same path are coalesced, so a burst of saves results in one write of the
+# newest content. Before writing, the file's signature on disk is compared with the
+# one seen when the file was opened (or last written by us) to detect external edits.
+#
+# AutosaveBuffer lives on the Tk thread and connects a textbox to the writer:
+# it debounces edits, skips unchanged content and tracks the dirty state. Edits that
+# could not be written after the buffer moved on to another file (conflict or
+# error) are handed to on_lost instead of being dropped.
+
+DEBOUNCE_MS = 1500
+
+STATE_CLEAN = "clean"
+STATE_DIRTY = "dirty"
+STATE_SAVING = "saving"
+STATE_CONFLICT = "conflict"
+STATE_ERROR = "error"
+
+# Why a write happens; before-write hooks (e.g. snapshots) use this
+REASON_OPEN = "open"          # first write after a file was opened
+REASON_AUTOSAVE = "autosave"
+REASON_MANUAL = "manual"
+REASON_AI = "ai"
+REASON_RESTORE = "restore"
+
+RESULT_SAVED = "saved"
+RESULT_CONFLICT = "conflict"
+RESULT_ERROR = "error"
+
+
+def atomic_write(path, text, encoding="utf-8"):
+    # Write to a temp file in the same directory, then rename over the target, so a
+    # crash or sync hiccup never leaves a truncated file behind
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class AutosaveWriter:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pending = {}      # path -> (text, force, on_result, reason)
+        self.signatures = {}   # path -> signature we expect on disk
+        self.before_write = []  # hook(path, reason), called on the writer thread
+        self.busy = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="autosave-writer", daemon=True)
+        self.thread.start()
+
+    def track(self, path):
+        # Remember the on-disk state of a freshly opened file
+        with self.condition:
+            self.signatures[path] = file_signature(path)
+
+    def forget(self, path):
+        with self.condition:
+            self.signatures.pop(path, None)
+
+    def submit(self, path, text, on_result=None, force=False, reason=REASON_AUTOSAVE):
+        # on_result(path, result, detail) is called from the writer thread
+        with self.condition:
+            if path in self.pending:
+                # Coalesce: newer content wins, but keep a pending force flag and
+                # a more specific reason than a plain autosave
+                _, pending_force, _, pending_reason = self.pending[path]
+                force = force or pending_force
+                if reason == REASON_AUTOSAVE:
+                    reason = pending_reason
+            self.pending[path] = (text, force, on_result, reason)
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if not self.pending and self.stopped:
+                    return
+                path, (text, force, on_result, reason) = self.pending.popitem()
+                expected = self.signatures.get(path, file_signature(path))
+                self.busy = True
+
+            result, detail = self.write(path, text, expected, force, reason)
+
+            with self.condition:
+                if result == RESULT_SAVED:
+                    self.signatures[path] = detail
+                self.busy = False
+                self.condition.notify_all()
+            if on_result:
+                on_result(path, result, detail)
+
+    def write(self, path, text, expected, force, reason):
+        current = file_signature(path)
+        if not force and current is not None and current != expected:
+            return RESULT_CONFLICT, current
+        try:
+            for hook in self.before_write:
+                hook(path, reason)
+            atomic_write(path, text)
+        except Exception as e:
+            return RESULT_ERROR, e
+        return RESULT_SAVED, file_signature(path)
+
+    def flush(self, timeout=None):
+        # Blocks until everything submitted so far has been written
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.pending and not self.busy, timeout)
+
+    def close(self, timeout=5.0):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+
+
+class AutosaveBuffer:
+    def __init__(self, widget, textbox, writer, post_to_ui, on_state=None, on_saved=None, on_lost=None, debounce_ms=DEBOUNCE_MS):
+        # widget: any Tk widget for after(); post_to_ui: thread-safe callback scheduler;
+        # on_lost(path, text, result, detail): unsaved text of a detached file
+        self.widget = widget
+        self.textbox = textbox
+        self.writer = writer
+        self.post_to_ui = post_to_ui
+        self.on_state = on_state
+        self.on_saved = on_saved
+        self.on_lost = on_lost
+        self.debounce_ms = debounce_ms
+        self.path = None
+        self.saved_hash = None
+        self.state = STATE_CLEAN
+        self.timer = None
+        self.notify_next_save = False
+        self.written_since_attach = False
+        self.textbox.bind("<<Modified>>", self.on_modified, add="+")
+
+    def attach(self, path, text):
+        # Call after the textbox was filled with the file's content
+        self.cancel_timer()
+        self.path = path
+        self.saved_hash = content_hash(text)
+        self.written_since_attach = False
+        self.writer.track(path)
+        self.textbox.edit_modified(False)
+        self.set_state(STATE_CLEAN)
+
+    def detach(self):
+        # Writes pending edits; the results arrive after path was reset, see on_result
+        self.cancel_timer()
+        if self.state == STATE_CONFLICT:
+            # flush() would skip them, so they would silently be gone
+            text = self.current_text()
+            if self.path and content_hash(text) != self.saved_hash and self.on_lost:
+                self.on_lost(self.path, text, RESULT_CONFLICT, None)
+        else:
+            self.flush()
+        self.path = None
+
+    def current_text(self):
+        # "end-1c" skips the newline Tk always appends at the end of a text widget
+        return self.textbox.get("1.0", "end-1c")
+
+    def on_modified(self, event=None):
+        if not self.textbox.edit_modified():
+            return
+        self.textbox.edit_modified(False)
+        if not self.path:
+            return
+        if self.state not in (STATE_CONFLICT, STATE_DIRTY):
+            self.set_state(STATE_DIRTY)
+        self.cancel_timer()
+        self.timer = self.widget.after(self.debounce_ms, self.flush)
+
+    def cancel_timer(self):
+        if self.timer:
+            self.widget.after_cancel(self.timer)
+            self.timer = None
+
+    def flush(self, force=False, notify=False, reason=None):
+        # Hands the current content to the writer if it differs from what is on disk
+        self.timer = None
+        if not self.path:
+            return False
+        if self.state == STATE_CONFLICT and not force:
+            return False
+        text = self.current_text()
+        text_hash = content_hash(text)
+        if text_hash == self.saved_hash and not force:
+            if self.state == STATE_DIRTY:
+                self.set_state(STATE_CLEAN)
+            return False
+
+        if reason is None:
+            reason = REASON_AUTOSAVE if self.written_since_attach else REASON_OPEN
+        self.written_since_attach = True
+        self.notify_next_save = self.notify_next_save or notify
+        self.set_state(STATE_SAVING)
+        self.writer.submit(self.path, text, lambda path, result, detail: self.post_to_ui(self.on_result, path, result, detail, text), force=force, reason=reason)
+        return True
+
+    def save_now(self, reason=REASON_MANUAL):
+        # Manual save: also overwrites after a conflict was reported
+        if not self.path:
+            return
+        self.cancel_timer()
+        if not self.flush(force=self.state == STATE_CONFLICT, notify=True, reason=reason) and self.on_saved:
+            self.on_saved(self.path, True)
+
+    def on_result(self, path, result, detail, text):
+        text_hash = content_hash(text)
+        if path != self.path:
+            # Detached in the meantime: nobody sees the state any more
+            if result != RESULT_SAVED and self.on_lost:
+                self.on_lost(path, text, result, detail)
+            return
+        if result == RESULT_SAVED:
+            self.saved_hash = text_hash
+            # Edits made while the write was in flight keep the buffer dirty
+            self.set_state(STATE_CLEAN if content_hash(self.current_text()) == text_hash else STATE_DIRTY)
+            if self.on_saved:
+                self.on_saved(path, self.notify_next_save)
+            self.notify_next_save = False
+        elif result == RESULT_CONFLICT:
+            self.set_state(STATE_CONFLICT, detail)
+        else:
+            self.set_state(STATE_ERROR, detail)
+
+    def set_state(self, state, detail=None):
+        self.state = state
+        if self.on_state:
+            self.on_state(state, detail)
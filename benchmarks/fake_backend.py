@@ -0,0 +1,45 @@
+import time
+import random
+
+from model_backends import ModelBackend, ModelRoute, ModelRouter
+
+
+# --- Fake model backend ---
+# Implements the model_backends interface with a predictable, configurable
+# latency so the benchmarks run offline and without an API key.
+
+class FakeBackend(ModelBackend):
+    name = "fake"
+
+    def __init__(self, latency=0.0, jitter=0.0, reply_size=1500, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.reply_size = reply_size
+        self.random = random.Random(seed)
+
+    def generate(self, model, history, prompt):
+        self.wait()
+        return self.reply_for(prompt)
+
+    def wait(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def reply_for(self, prompt):
+        # A markdown answer of roughly reply_size characters
+        body = "Das ist eine **Antwort** mit `code` und *Betonung*.\n- Punkt eins\n- Punkt zwei\n"
+        reply = "## Antwort\n"
+        while len(reply) < self.reply_size:
+            reply += body
+        return reply
+
+
+def make_fake_router(latency=0.0, jitter=0.0, reply_size=1500):
+    backend = FakeBackend(latency, jitter, reply_size)
+    return ModelRouter([
+        ModelRoute(backend, "fake-flash", cost=1.0, tier=1, latency=latency),
+        ModelRoute(backend, "fake-pro", cost=10.0, tier=2, latency=latency),
+    ])
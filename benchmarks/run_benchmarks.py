@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import platform
+import threading
+import statistics
+import tempfile
+
+# Allow running as a plain script from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import projekt_core
+import job_system
+from context_tracker import ContextTracker
+from benchmarks.synthetic import generate_workspace, make_chat_history
+from benchmarks.fake_backend import make_fake_router
+
+
+# --- Benchmarks ---
+# Each benchmark is a function taking the workspace description and returning a
+# callable that runs one iteration. Everything is headless: the GUI methods are
+# thin wrappers around projekt_core, which is what gets timed here.
+
+def bench_load_projects(workspace, args):
+    def run():
+        projekt_core.read_projects_csv(workspace["csv_path"])
+    return run
+
+
+def bench_select_project(workspace, args):
+    # Mirrors select_project: chat list, info panel, TODO tab and file tree
+    project = workspace["heavy_projects"][0]
+
+    def run():
+        path = project["Pfad"]
+        projekt_core.list_chat_files(path)
+        os.stat(path)
+        projekt_core.find_last_modified_file(path)
+        todo_path = os.path.join(path, projekt_core.TODO_FILE_NAME)
+        if os.path.exists(todo_path):
+            with open(todo_path, "r", encoding="utf-8") as f:
+                f.read()
+        projekt_core.scan_project_dir(path)
+    return run
+
+
+def bench_save_chat_history(workspace, args):
+    router = make_fake_router()
+    history = make_chat_history(random.Random(1), args.messages, args.message_chars)
+    chat = router.start_chat(history=history)
+    chat_file = os.path.join(workspace["root"], "bench_chat", "chat_bench.json")
+
+    def run():
+        projekt_core.write_chat_history(chat_file, chat.history)
+    return run
+
+
+def bench_load_selected_chat(workspace, args):
+    project = workspace["heavy_projects"][0]
+    router = make_fake_router()
+
+    def run():
+        chat_file = projekt_core.list_chat_files(project["Pfad"])[0]
+        history = projekt_core.read_chat_history(os.path.join(projekt_core.get_chat_dir(project["Pfad"]), chat_file))
+        router.start_chat(history=history)
+        for sender, text in projekt_core.history_to_messages(history):
+            projekt_core.parse_markdown(text)
+    return run
+
+
+def bench_markdown(workspace, args):
+    history = make_chat_history(random.Random(2), args.messages, args.message_chars)
+    texts = [text for _, text in projekt_core.history_to_messages(history)]
+
+    def run():
+        for text in texts:
+            projekt_core.parse_markdown(text)
+    return run
+
+
+def bench_context_assembly(workspace, args):
+    project = workspace["heavy_projects"][0]
+    open_file = (os.path.join(project["Pfad"], "datei_00000.py"), "x = 1\n" * 2000)
+    user_input = "Bitte liste alle Dateien und lies die datei datei_00001.md"
+
+    def run():
+        context_parts, _ = projekt_core.build_context_parts(project, user_input, open_file)
+        projekt_core.compose_prompt(context_parts, user_input)
+    return run
+
+
+def bench_context_tracked(workspace, args):
+    # Later turns of an editing session: one line changes between turns
+    project = workspace["heavy_projects"][0]
+    tracker = ContextTracker()
+    lines = ["x = 1\n"] * 2000
+    user_input = "Was hat sich geändert?"
+    prompt_sizes = []
+
+    def run():
+        lines[len(prompt_sizes) % len(lines)] = f"x = {len(prompt_sizes)}\n"
+        open_file = (os.path.join(project["Pfad"], "datei_00000.py"), "".join(lines))
+        context_parts, _ = projekt_core.build_context_parts(project, user_input, open_file, tracker)
+        prompt_sizes.append(len(projekt_core.compose_prompt(context_parts, user_input)))
+        tracker.commit()
+    return run
+
+
+def bench_send_message(workspace, args):
+    # Full turn against the fake backend, including its configured latency
+    project = workspace["heavy_projects"][0]
+    router = make_fake_router(latency=args.latency)
+    chat = router.start_chat(history=[])
+    user_input = "Was ist der Stand im Projekt?"
+
+    def run():
+        context_parts, _ = projekt_core.build_context_parts(project, user_input)
+        response = chat.send_message(projekt_core.compose_prompt(context_parts, user_input))
+        projekt_core.parse_markdown(response.text)
+        projekt_core.extract_code_block(response.text)
+    return run
+
+
+def project_files(project):
+    return [path for _, path, is_dir in projekt_core.scan_project_dir(project["Pfad"]) if not is_dir]
+
+
+def bench_hash_files(workspace, args):
+    # Baseline for hash_files_pool: the same job function on this thread
+    paths = project_files(workspace["heavy_projects"][0])
+    context = job_system.JobContext(0, workspace["root"])
+
+    def run():
+        job_system.hash_files(context, paths)
+    return run
+
+
+def bench_hash_files_pool(workspace, args):
+    # One job per worker process; the warmup run starts the workers
+    paths = project_files(workspace["heavy_projects"][0])
+    jobs = job_system.JobSystem(lambda callback, *callback_args: callback(*callback_args))
+    chunks = [paths[i::jobs.max_workers] for i in range(jobs.max_workers)]
+
+    def run():
+        remaining = [len(chunks)]
+        errors = []
+        finished = threading.Event()
+
+        def on_done(job, result, error):
+            # Called on the executor's thread
+            if error:
+                errors.append(error)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                finished.set()
+
+        for chunk in chunks:
+            jobs.submit(job_system.JOB_HASH_FILES, (chunk,), on_done=on_done)
+        finished.wait()
+        if errors:
+            raise errors[0]
+
+    # Stops the workers and removes the job directories after the timing loop
+    run.teardown = jobs.shutdown
+    return run
+
+
+BENCHMARKS = {
+    "load_projects": bench_load_projects,
+    "select_project": bench_select_project,
+    "save_chat_history": bench_save_chat_history,
+    "load_selected_chat": bench_load_selected_chat,
+    "markdown": bench_markdown,
+    "context_assembly": bench_context_assembly,
+    "context_tracked": bench_context_tracked,
+    "send_message": bench_send_message,
+    "hash_files": bench_hash_files,
+    "hash_files_pool": bench_hash_files_pool,
+}
+
+
+def time_benchmark(run, repeat, warmup):
+    for _ in range(warmup):
+        run()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return {
+        "min_ms": min(samples) * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+        "repeat": repeat,
+    }
+
+
+def compare_to_baseline(results, baseline, threshold):
+    print(f"\n{'Benchmark':<22}{'Baseline':>12}{'Aktuell':>12}{'Änderung':>10}")
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            print(f"{name:<22}{'-':>12}{result['median_ms']:>10.2f}ms{'neu':>10}")
+            continue
+        change = (result["median_ms"] - old["median_ms"]) / old["median_ms"] if old["median_ms"] else 0.0
+        print(f"{name:<22}{old['median_ms']:>10.2f}ms{result['median_ms']:>10.2f}ms{change:>+10.1%}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the project assistant.")
+    parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--projects", type=int, default=300)
+    parser.add_argument("--heavy-projects", type=int, default=3)
+    parser.add_argument("--files", type=int, default=2000, help="Files per heavy project")
+    parser.add_argument("--chats", type=int, default=5, help="Chats per heavy project")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per chat")
+    parser.add_argument("--message-chars", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake backend latency in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--workspace", help="Reuse/keep the synthetic workspace in this directory")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json"))
+    parser.add_argument("--baseline", help="Compare against this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown counted as regression")
+    args = parser.parse_args(argv)
+
+    workspace_root = args.workspace or tempfile.mkdtemp(prefix="assistant_bench_")
+    try:
+        print(f"Erzeuge synthetischen Workspace in {workspace_root} ...")
+        workspace = generate_workspace(
+            workspace_root,
+            projects=args.projects,
+            heavy_projects=max(1, args.heavy_projects),
+            files_per_project=args.files,
+            chats_per_project=max(1, args.chats),
+            messages_per_chat=args.messages,
+            message_chars=args.message_chars,
+        )
+
+        results = {}
+        for name in args.only or BENCHMARKS:
+            run = BENCHMARKS[name](workspace, args)
+            try:
+                results[name] = time_benchmark(run, args.repeat, args.warmup)
+            finally:
+                if hasattr(run, "teardown"):
+                    run.teardown()
+            print(f"{name:<22}{results[name]['median_ms']:>10.2f}ms (min {results[name]['min_ms']:.2f}ms)")
+    finally:
+        if not args.workspace:
+            shutil.rmtree(workspace_root, ignore_errors=True)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "workspace", "only")},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nErgebnisse gespeichert in {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nLangsamer als die Baseline: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import csv
+import os
+import json
+import random
+
+
+# --- Synthetic workspaces ---
+# Builds a throwaway projekte.csv plus project directories that look like the real
+# Google Drive tree: many projects, a few heavy ones with thousands of files,
+# long chat histories and a TODO.md.
+
+PROJECT_TYPES = ["KiCad", "Python", "CAD", "Dokumentation"]
+FILE_EXTENSIONS = [".py", ".md", ".txt", ".kicad_sch", ".kicad_pcb", ".json", ".csv"]
+
+MARKDOWN_SAMPLE = """## Zusammenfassung
+Das Projekt verwendet **KiCad 7** und ein *Raspberry Pi Pico*.
+- Spannungsversorgung über `USB-C`
+- Messung der Phasenfolge
+1. Schaltplan prüfen
+2. Layout anpassen
+```
+def main():
+    print("Hallo Welt")
+```
+### Nächste Schritte
+Bitte die Datei `main.py` lesen und **Fehler** beheben.
+"""
+
+
+def make_message_text(rng, size):
+    text = ""
+    while len(text) < size:
+        text += MARKDOWN_SAMPLE
+        text += " ".join(rng.choice(["Spannung", "Strom", "Bauteil", "Footprint", "Netz"]) for _ in range(20)) + "\n"
+    return text
+
+
+def make_chat_history(rng, messages, message_chars):
+    history = []
+    for i in range(messages):
+        role = "user" if i % 2 == 0 else "model"
+        size = message_chars // 4 if role == "user" else message_chars
+        history.append({"role": role, "parts": [{"text": make_message_text(rng, size)}]})
+    return history
+
+
+def generate_workspace(root, projects=300, heavy_projects=3, files_per_project=2000,
+                       subdirs=20, chats_per_project=5, messages_per_chat=200,
+                       message_chars=2000, seed=1234):
+    # Returns a dict describing the generated workspace
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+    projects_dir = os.path.join(root, "projects")
+    rows = []
+
+    for index in range(projects):
+        name = f"Projekt_{index:04d}"
+        path = os.path.join(projects_dir, name)
+        os.makedirs(path, exist_ok=True)
+        rows.append({
+            "Projektname": name,
+            "Typ": PROJECT_TYPES[index % len(PROJECT_TYPES)],
+            "Pfad": path,
+            "Notizen": f"Synthetisches Projekt {index}",
+        })
+
+        heavy = index < heavy_projects
+        file_count = files_per_project if heavy else 10
+        for sub in range(subdirs if heavy else 1):
+            os.makedirs(os.path.join(path, f"ordner_{sub:02d}"), exist_ok=True)
+        for file_index in range(file_count):
+            ext = FILE_EXTENSIONS[file_index % len(FILE_EXTENSIONS)]
+            with open(os.path.join(path, f"datei_{file_index:05d}{ext}"), "w", encoding="utf-8") as f:
+                f.write(f"# Datei {file_index}\n" + "x = 1\n" * rng.randint(1, 20))
+
+        with open(os.path.join(path, "TODO.md"), "w", encoding="utf-8") as f:
+            f.write(f"# To-Do-Liste für {name}\n\n")
+            for task in range(30 if heavy else 5):
+                f.write(f"- [{'x' if task % 3 == 0 else ' '}] Aufgabe {task}\n")
+
+        if heavy:
+            chat_dir = os.path.join(path, ".chats")
+            os.makedirs(chat_dir, exist_ok=True)
+            for chat_index in range(chats_per_project):
+                history = make_chat_history(rng, messages_per_chat, message_chars)
+                with open(os.path.join(chat_dir, f"chat_2024-01-{chat_index + 1:02d}_12-00-00.json"), "w", encoding="utf-8") as f:
+                    json.dump(history, f, indent=2)
+
+    csv_path = os.path.join(root, "projekte.csv")
+    with open(csv_path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=["Projektname", "Typ", "Pfad", "Notizen"], quoting=csv.QUOTE_ALL)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    return {
+        "root": root,
+        "csv_path": csv_path,
+        "projects": rows,
+        "heavy_projects": rows[:heavy_projects],
+    }
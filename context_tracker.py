@@ -0,0 +1,162 @@
+import os
+import difflib
+import hashlib
+import subprocess
+
+
+# --- Change-aware context ---
+# Remembers which file contents the model has already seen in the current chat.
+# Later turns send an "unchanged" marker or a unified diff instead of the full
+# file. For git repositories it also reports files that changed in the working
+# tree between two turns, with their git diff when it is small enough.
+#
+# Updates are staged while the prompt is built and only committed once the model
+# actually received it, so a failed request never leaves the tracker out of sync.
+
+# Send a diff only if it is clearly smaller than the full content
+DIFF_RATIO = 0.6
+GIT_DIFF_LIMIT = 4000
+GIT_TIMEOUT = 5
+IGNORED_PREFIXES = (".chats/", ".snapshots/")
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def run_git(project_path, *args):
+    # Returns stdout or None if git is missing / this is not a repository
+    try:
+        result = subprocess.run(
+            ["git", *args], cwd=project_path, capture_output=True, timeout=GIT_TIMEOUT,
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+class ContextTracker:
+    def __init__(self):
+        self.seen = {}          # key -> (hash, content) the model has seen
+        self.git_state = None   # path -> signature of the dirty working tree at the last turn
+        self.git_prefixes = {}  # project path -> its path below the repository root, None outside git
+        self.pending = {}
+        self.pending_git_state = None
+
+    def reset(self):
+        self.seen = {}
+        self.git_state = None
+        self.pending = {}
+        self.pending_git_state = None
+
+    def commit(self):
+        # Call after the prompt was delivered to the model
+        self.seen.update(self.pending)
+        self.pending = {}
+        if self.pending_git_state is not None:
+            self.git_state = self.pending_git_state
+            self.pending_git_state = None
+
+    def mark_seen(self, key, content):
+        # For content the model produced itself, e.g. a file it rewrote
+        self.seen[key] = (content_hash(content), content)
+
+    def discard(self):
+        self.pending = {}
+        self.pending_git_state = None
+
+    def file_part(self, key, title, content):
+        # Returns the context part for a file, full or as a delta
+        new_hash = content_hash(content)
+        seen = self.pending.get(key) or self.seen.get(key)
+        self.pending[key] = (new_hash, content)
+
+        if seen and seen[0] == new_hash:
+            return f"\n--- {title}: unverändert seit der letzten Nachricht (Inhalt siehe oben) ---"
+        if seen:
+            diff = self.diff(seen[1], content)
+            if len(diff) < len(content) * DIFF_RATIO:
+                return f"\n--- {title}: geändert seit der letzten Nachricht, Unterschiede (unified diff) ---\n{diff}"
+        return f"\n--- {title} ---\n{content}"
+
+    def diff(self, old, new):
+        return "".join(difflib.unified_diff(
+            old.splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile="zuletzt gesehen", tofile="aktuell", n=3,
+        ))
+
+    # --- git ---
+
+    def git_prefix(self, project_path):
+        # "" at the repository root, "sub/dir/" for a project inside a repository
+        if project_path not in self.git_prefixes:
+            output = run_git(project_path, "rev-parse", "--show-prefix") if os.path.isdir(project_path) else None
+            self.git_prefixes[project_path] = output.strip() if output is not None else None
+        return self.git_prefixes[project_path]
+
+    def is_git_repo(self, project_path):
+        return self.git_prefix(project_path) is not None
+
+    def git_working_tree_state(self, project_path):
+        # Changes inside the project only, keyed by paths relative to the project.
+        # git status prints paths relative to the repository root, git diff takes
+        # pathspecs relative to its working directory (the project).
+        prefix = self.git_prefix(project_path) or ""
+        output = run_git(project_path, "status", "--porcelain", "-z", "--untracked-files=normal", "--", ".")
+        if output is None:
+            return None
+        state = {}
+        entries = output.split("\0")
+        i = 0
+        while i < len(entries):
+            entry = entries[i]
+            i += 1
+            if len(entry) < 4:
+                continue
+            status, path = entry[:2], entry[3:]
+            if status[0] in "RC":
+                i += 1 # Skip the original path of renames/copies
+            if not path.startswith(prefix):
+                continue
+            path = path[len(prefix):]
+            if not path or path.startswith(IGNORED_PREFIXES):
+                continue
+            try:
+                stat = os.stat(os.path.join(project_path, path))
+                state[path] = (status, stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                state[path] = (status, None, None)
+        return state
+
+    def git_changes_part(self, project_path, exclude=()):
+        # Lists working tree changes since the last turn; nothing on the first turn
+        if not self.is_git_repo(project_path):
+            return None
+        state = self.git_working_tree_state(project_path)
+        if state is None:
+            return None
+        previous = self.git_state
+        self.pending_git_state = state
+        if previous is None:
+            return None
+
+        exclude = {os.path.normcase(os.path.abspath(path)) for path in exclude}
+        changed = sorted(
+            path for path in set(state) | set(previous)
+            if state.get(path) != previous.get(path)
+            and os.path.normcase(os.path.abspath(os.path.join(project_path, path))) not in exclude
+        )
+        if not changed:
+            return None
+
+        lines = [f"- {state[path][0].strip() if path in state else 'sauber'} {path}" for path in changed]
+        part = "\n--- Seit der letzten Nachricht im Projekt geänderte Dateien (git) ---\n" + "\n".join(lines)
+        tracked = [path for path in changed if path in state and not state[path][0].startswith("?")]
+        if tracked:
+            diff = run_git(project_path, "diff", "HEAD", "--", *tracked)
+            if diff and len(diff) <= GIT_DIFF_LIMIT:
+                part += "\n\nDiff gegenüber HEAD:\n" + diff
+        return part
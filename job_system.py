@@ -0,0 +1,371 @@
+import os
+import re
+import time
+import pickle
+import shutil
+import hashlib
+import tempfile
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import projekt_core
+import workspace_cache
+
+
+# --- Job system ---
+# CPU-heavy pure-Python work (parsing, tokenizing, hashing, image decoding) runs in
+# a pool of worker processes, so it uses all cores and never holds the GIL of the
+# Tk process. Every job has a kind from JOB_KINDS and a group (usually the project
+# path); switching projects cancels the previous group's jobs.
+#
+# Each job gets its own directory below a temporary root:
+#   cancel        marker file; the job stops at its next progress() call
+#   result.pickle results larger than HANDOFF_THRESHOLD, read back by the app
+# Small results travel back through the executor as usual. Progress goes through
+# a multiprocessing queue and is handed to the Tk thread via post_to_ui.
+
+JOB_TOKENIZE_CHATS = "tokenize_chats"
+JOB_PARSE_KICAD = "parse_kicad"
+JOB_HASH_FILES = "hash_files"   # used by the benchmarks (hash_files_pool)
+JOB_DECODE_IMAGE = "decode_image"
+
+HANDOFF_THRESHOLD = 256 * 1024
+PROGRESS_INTERVAL = 0.1
+CANCEL_CHECK_INTERVAL = 0.05
+CANCEL_MARKER = "cancel"
+RESULT_FILE = "result.pickle"
+
+KICAD_EXTENSIONS = (".kicad_sch", ".kicad_pcb")
+TOKEN_PATTERN = re.compile(r"\w{2,}")
+SEXPR_TOKEN = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# --- Inside the worker processes ---
+
+worker_progress_queue = None
+
+
+def init_worker(progress_queue):
+    global worker_progress_queue
+    worker_progress_queue = progress_queue
+
+
+class JobContext:
+    # Passed to the job functions; progress() is also where cancellation happens
+
+    def __init__(self, job_id, job_dir):
+        self.job_id = job_id
+        self.job_dir = job_dir
+        self.last_report = 0.0
+        self.last_check = 0.0
+
+    def progress(self, done, total):
+        now = time.monotonic()
+        if now - self.last_check >= CANCEL_CHECK_INTERVAL:
+            self.last_check = now
+            if os.path.exists(os.path.join(self.job_dir, CANCEL_MARKER)):
+                raise JobCancelled()
+        if worker_progress_queue is not None and (done >= total or now - self.last_report >= PROGRESS_INTERVAL):
+            self.last_report = now
+            worker_progress_queue.put((self.job_id, done, total))
+
+
+def run_job(kind, job_id, job_dir, args):
+    result = JOB_KINDS[kind](JobContext(job_id, job_dir), *args)
+    data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) <= HANDOFF_THRESHOLD:
+        return False, result
+    path = os.path.join(job_dir, RESULT_FILE)
+    with open(path, "wb") as f:
+        f.write(data)
+    return True, path
+
+
+# --- Job kinds ---
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def tokenize_chats(context, chat_files):
+    # Returns {token: [chat file names]} for the chat search
+    index = {}
+    for number, chat_file in enumerate(chat_files, 1):
+        try:
+            history = projekt_core.read_chat_history(chat_file)
+            name = os.path.basename(chat_file)
+            for _, text in projekt_core.history_to_messages(history):
+                for token in tokenize(text):
+                    index.setdefault(token, set()).add(name)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        context.progress(number, len(chat_files))
+    return {token: sorted(names) for token, names in index.items()}
+
+
+def search_chat_index(index, query):
+    # Chat file names containing every word of the query
+    names = None
+    for token in set(tokenize(query)):
+        matches = set(index.get(token, ()))
+        names = matches if names is None else names & matches
+    return names or set()
+
+
+def parse_sexpr(text, on_progress=None):
+    # KiCad S-expression -> nested lists of strings (quotes removed)
+    stack = [[]]
+    for number, match in enumerate(SEXPR_TOKEN.finditer(text)):
+        token = match.group()
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            if len(stack) == 1:
+                raise ValueError("Unerwartete schließende Klammer")
+            node = stack.pop()
+            stack[-1].append(node)
+        elif token[0] == '"':
+            stack[-1].append(token[1:-1].replace('\\"', '"').replace("\\\\", "\\"))
+        else:
+            stack[-1].append(token)
+        if on_progress and number % 50000 == 0:
+            on_progress(match.start())
+    if len(stack) != 1:
+        raise ValueError("Nicht geschlossene Klammer")
+    return stack[0]
+
+
+def kicad_title(root):
+    for node in root:
+        if isinstance(node, list) and node and node[0] == "title_block":
+            for field in node[1:]:
+                if isinstance(field, list) and len(field) > 1 and field[0] == "title":
+                    return field[1]
+    return ""
+
+
+def parse_kicad(context, paths):
+    # Summarizes schematics and boards: number of placed symbols and footprints
+    summary = {"schematics": 0, "boards": 0, "symbols": 0, "footprints": 0, "title": "", "errors": []}
+    sizes = [os.path.getsize(path) for path in paths]
+    total = sum(sizes) or 1
+    done = 0
+    for path, size in zip(paths, sizes):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            tree = parse_sexpr(text, lambda position: context.progress(done + position, total))
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            summary["errors"].append(f"{os.path.basename(path)}: {e}")
+            done += size
+            context.progress(done, total)
+            continue
+
+        for root in tree:
+            if not isinstance(root, list) or not root:
+                continue
+            children = [node for node in root[1:] if isinstance(node, list) and node]
+            if root[0] == "kicad_sch":
+                summary["schematics"] += 1
+                for node in children:
+                    if node[0] != "symbol":
+                        continue
+                    lib_id = next((field[1] for field in node[1:] if isinstance(field, list) and len(field) > 1 and field[0] == "lib_id"), "")
+                    if not lib_id.startswith("power:"):
+                        summary["symbols"] += 1
+            elif root[0] == "kicad_pcb":
+                summary["boards"] += 1
+                summary["footprints"] += sum(1 for node in children if node[0] in ("footprint", "module"))
+            summary["title"] = summary["title"] or kicad_title(children)
+        done += size
+        context.progress(done, total)
+    return summary
+
+
+def hash_files(context, paths):
+    # Returns {path: sha256 hex digest}; unreadable files are left out
+    sizes = {}
+    for path in paths:
+        try:
+            sizes[path] = os.path.getsize(path)
+        except OSError:
+            pass
+    total = sum(sizes.values()) or 1
+    done = 0
+    digests = {}
+    for path in sizes:
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    done += len(chunk)
+                    context.progress(done, total)
+        except OSError:
+            continue
+        digests[path] = digest.hexdigest()
+    context.progress(total, total)
+    return digests
+
+
+def decode_image(context, photo_path):
+    # Returns the info panel thumbnail as PNG bytes
+    context.progress(0, 1)
+    data = workspace_cache.make_thumbnail(photo_path)
+    context.progress(1, 1)
+    return data
+
+
+JOB_KINDS = {
+    JOB_TOKENIZE_CHATS: tokenize_chats,
+    JOB_PARSE_KICAD: parse_kicad,
+    JOB_HASH_FILES: hash_files,
+    JOB_DECODE_IMAGE: decode_image,
+}
+
+
+# --- In the app process ---
+
+class Job:
+    def __init__(self, job_id, kind, group, job_dir, on_done, on_progress):
+        self.id = job_id
+        self.kind = kind
+        self.group = group
+        self.dir = job_dir
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.future = None
+        self.cancelled = False
+        self.progress = (0, 0)
+
+
+class JobSystem:
+    def __init__(self, post_to_ui, max_workers=None):
+        # post_to_ui: thread-safe callback scheduler of the Tk thread
+        self.post_to_ui = post_to_ui
+        # Leave one core for the UI process
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        # "spawn" everywhere: forking a process with a running Tk and threads is unsafe
+        self.context = multiprocessing.get_context("spawn")
+        self.executor = None
+        self.progress_queue = None
+        self.root = None
+        self.jobs = {}   # id -> Job
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def start(self):
+        # Lazily on the first job, so the app does not wait for worker processes
+        if self.root is None:
+            self.root = tempfile.mkdtemp(prefix="projekt_jobs_")
+            self.progress_queue = self.context.Queue()
+            threading.Thread(target=self.pump_progress, args=(self.progress_queue,), name="job-progress", daemon=True).start()
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.max_workers, mp_context=self.context, initializer=init_worker, initargs=(self.progress_queue,))
+
+    def submit(self, kind, args=(), group=None, on_done=None, on_progress=None):
+        # on_done(job, result, error) and on_progress(job, done, total) run on the Tk
+        # thread. Cancelled jobs do not call on_done.
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unbekannte Job-Art: {kind}")
+        with self.lock:
+            self.start()
+            job_id = next(self.ids)
+            job_dir = os.path.join(self.root, str(job_id))
+            os.makedirs(job_dir)
+            job = Job(job_id, kind, group, job_dir, on_done, on_progress)
+            self.jobs[job_id] = job
+            job.future = self.executor.submit(run_job, kind, job_id, job_dir, tuple(args))
+        job.future.add_done_callback(lambda future: self.finish(job, future))
+        return job
+
+    def cancel(self, job):
+        job.cancelled = True
+        if not job.future.cancel():
+            # Already running: the worker sees the marker at its next progress() call
+            try:
+                with open(os.path.join(job.dir, CANCEL_MARKER), "w"):
+                    pass
+            except OSError:
+                pass
+
+    def cancel_group(self, group):
+        with self.lock:
+            jobs = [job for job in self.jobs.values() if job.group == group]
+        for job in jobs:
+            self.cancel(job)
+
+    def running(self):
+        with self.lock:
+            return [job for job in self.jobs.values() if not job.cancelled]
+
+    def finish(self, job, future):
+        # Called on an executor thread
+        with self.lock:
+            self.jobs.pop(job.id, None)
+        result, error = None, None
+        if future.cancelled():
+            job.cancelled = True
+        else:
+            try:
+                in_file, value = future.result()
+                if in_file:
+                    with open(value, "rb") as f:
+                        value = pickle.load(f)
+                result = value
+            except JobCancelled:
+                job.cancelled = True
+            except BrokenProcessPool as e:
+                # A worker died (e.g. out of memory); start a fresh pool for the next job
+                with self.lock:
+                    self.executor = None
+                error = e
+            except Exception as e:
+                error = e
+        shutil.rmtree(job.dir, ignore_errors=True)
+        if job.on_done and not job.cancelled:
+            self.post_to_ui(self.deliver, job, result, error)
+
+    def deliver(self, job, result, error):
+        # On the Tk thread; the job may have been cancelled while this was queued
+        if not job.cancelled:
+            job.on_done(job, result, error)
+
+    def pump_progress(self, progress_queue):
+        while True:
+            item = progress_queue.get()
+            if item is None:
+                return
+            job_id, done, total = item
+            with self.lock:
+                job = self.jobs.get(job_id)
+            if job and not job.cancelled:
+                job.progress = (done, total)
+                if job.on_progress:
+                    self.post_to_ui(self.report_progress, job, done, total)
+
+    def report_progress(self, job, done, total):
+        if not job.cancelled:
+            job.on_progress(job, done, total)
+
+    def shutdown(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            self.cancel(job)
+        if self.executor:
+            # Running jobs see their cancel marker within CANCEL_CHECK_INTERVAL, so
+            # waiting is short; the job root (and the markers) must stay until then
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self.progress_queue:
+            self.progress_queue.put(None)
+        if self.root:
+            shutil.rmtree(self.root, ignore_errors=True)
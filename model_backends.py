@@ -0,0 +1,295 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import urllib.request
+import urllib.error
+
+
+# --- Model backends ---
+# A backend turns (model, history, prompt) into a response text. History is always
+# the plain dict format stored in the .chats files:
+#   [{"role": "user" | "model", "parts": [{"text": "..."}]}, ...]
+# so a chat can move between backends and models from one turn to the next.
+
+TASK_QUICK = "quick"
+TASK_EDIT = "edit"
+
+# Per task: how long the user is willing to wait and the minimum model tier
+TASK_PROFILES = {
+    TASK_QUICK: {"max_latency": 6.0, "min_tier": 1},
+    TASK_EDIT: {"max_latency": 45.0, "min_tier": 2},
+}
+
+DEFAULT_ROUTES = [
+    {"backend": "gemini", "model": "gemini-1.5-flash", "cost": 1.0, "tier": 1, "latency": 2.0},
+    {"backend": "gemini", "model": "gemini-1.5-pro", "cost": 10.0, "tier": 2, "latency": 8.0},
+]
+
+ROUTES_FILE = "modelle.json"
+
+
+class ModelBackendError(Exception):
+    pass
+
+
+class ModelResponse:
+    def __init__(self, text, model, latency):
+        self.text = text
+        self.model = model
+        self.latency = latency
+
+
+def make_message(role, text):
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def message_text(message):
+    return "".join(part['text'] for part in message['parts'])
+
+
+class ModelBackend:
+    name = "base"
+
+    def generate(self, model, history, prompt):
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    name = "gemini"
+
+    def __init__(self, api_key):
+        # Imported here so the rest of the app (and the benchmarks) work without the SDK
+        import google.generativeai as genai
+        self.genai = genai
+        self.genai.configure(api_key=api_key)
+        self.models = {}
+
+    def generate(self, model, history, prompt):
+        if model not in self.models:
+            self.models[model] = self.genai.GenerativeModel(model)
+        try:
+            chat = self.models[model].start_chat(history=history)
+            return chat.send_message(prompt).text
+        except Exception as e:
+            raise ModelBackendError(f"Gemini ({model}): {e}") from e
+
+
+class OpenAICompatibleBackend(ModelBackend):
+    # Works with Ollama (http://localhost:11434/v1), llama.cpp, LM Studio, vLLM, ...
+    name = "local"
+
+    def __init__(self, base_url="http://localhost:11434/v1", api_key=None, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def generate(self, model, history, prompt):
+        messages = []
+        for message in history:
+            role = "assistant" if message['role'] == "model" else message['role']
+            messages.append({"role": role, "content": message_text(message)})
+        messages.append({"role": "user", "content": prompt})
+
+        body = json.dumps({"model": model, "messages": messages, "stream": False}).encode("utf-8")
+        request = urllib.request.Request(f"{self.base_url}/chat/completions", data=body, method="POST")
+        request.add_header("Content-Type", "application/json")
+        if self.api_key:
+            request.add_header("Authorization", f"Bearer {self.api_key}")
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.loads(response.read().decode("utf-8"))
+            return data["choices"][0]["message"]["content"]
+        except (urllib.error.URLError, OSError, ValueError, KeyError, IndexError) as e:
+            raise ModelBackendError(f"Lokales Modell ({model} @ {self.base_url}): {e}") from e
+
+
+class RecordReplayBackend(ModelBackend):
+    # Records request/response pairs as JSON "cassettes" and serves them back later.
+    # In replay mode the recorded latency is reproduced (scaled by speed) so the UI
+    # behaves like it does against the real API, but fully offline and deterministic.
+    # Cassettes are keyed by (history, prompt) only and all backends share one
+    # directory: the router picks models by the latencies it observes, so replay may
+    # ask for another model (or backend) than the recording did, and the recorded
+    # response is served regardless.
+    name = "replay"
+
+    def __init__(self, inner, cassette_dir, mode="replay", speed=1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        self.inner = inner
+        self.cassette_dir = cassette_dir
+        self.mode = mode
+        self.speed = speed
+        os.makedirs(cassette_dir, exist_ok=True)
+
+    def cassette_key(self, history, prompt):
+        payload = json.dumps([history, prompt], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cassette_path(self, key):
+        return os.path.join(self.cassette_dir, f"{key}.json")
+
+    def generate(self, model, history, prompt):
+        path = self.cassette_path(self.cassette_key(history, prompt))
+
+        if self.mode == "replay":
+            if not os.path.exists(path):
+                raise ModelBackendError(f"Keine Aufnahme für diese Anfrage gefunden ({os.path.basename(path)}).")
+            with open(path, "r", encoding="utf-8") as f:
+                cassette = json.load(f)
+            if self.speed > 0:
+                time.sleep(cassette.get("latency", 0.0) / self.speed)
+            return cassette["response"]
+
+        if self.inner is None:
+            raise ModelBackendError("Aufnahme-Modus benötigt ein echtes Backend.")
+        start = time.perf_counter()
+        text = self.inner.generate(model, history, prompt)
+        latency = time.perf_counter() - start
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "backend": self.inner.name,
+                "model": model,
+                "history": history,
+                "prompt": prompt,
+                "response": text,
+                "latency": latency,
+            }, f, indent=2, ensure_ascii=False)
+        return text
+
+
+# --- Routing ---
+
+class ModelRoute:
+    def __init__(self, backend, model, cost, tier, latency, kind=None):
+        self.backend = backend
+        self.model = model
+        # Backend kind from the route spec ("gemini", "local"); backend.name may be a
+        # wrapper's name, e.g. "replay"
+        self.kind = kind or backend.name
+        self.cost = cost
+        self.tier = tier
+        # Exponentially weighted average of observed latencies, seeded with the estimate
+        self.latency = latency
+
+    def record_latency(self, seconds, weight=0.3):
+        self.latency = (1 - weight) * self.latency + weight * seconds
+
+    def __repr__(self):
+        return f"ModelRoute({self.kind}:{self.model}, cost={self.cost}, tier={self.tier}, latency={self.latency:.1f}s)"
+
+
+class ModelRouter:
+    # Picks the cheapest model that is good enough for the task and fast enough
+    # for its latency budget. Falls back to the fastest capable model.
+
+    def __init__(self, routes, profiles=None):
+        if not routes:
+            raise ValueError("Mindestens eine Modell-Route wird benötigt.")
+        self.routes = routes
+        self.profiles = profiles or TASK_PROFILES
+        self.lock = threading.Lock()
+
+    def pick(self, task=TASK_QUICK):
+        profile = self.profiles.get(task, self.profiles[TASK_QUICK])
+        with self.lock:
+            capable = [r for r in self.routes if r.tier >= profile["min_tier"]]
+            if not capable:
+                # Nothing reaches the tier, use the best we have
+                best_tier = max(r.tier for r in self.routes)
+                capable = [r for r in self.routes if r.tier == best_tier]
+            fast_enough = [r for r in capable if r.latency <= profile["max_latency"]]
+            if fast_enough:
+                return min(fast_enough, key=lambda r: (r.cost, r.latency))
+            return min(capable, key=lambda r: (r.latency, r.cost))
+
+    def record_latency(self, route, seconds):
+        with self.lock:
+            route.record_latency(seconds)
+
+    def start_chat(self, history=None):
+        return ChatSession(self, history)
+
+
+class ChatSession:
+    def __init__(self, router, history=None):
+        self.router = router
+        self.history = list(history or [])
+
+    def send_message(self, prompt, task=TASK_QUICK):
+        route = self.router.pick(task)
+        start = time.perf_counter()
+        text = route.backend.generate(route.model, self.history, prompt)
+        latency = time.perf_counter() - start
+        self.router.record_latency(route, latency)
+
+        self.history.append(make_message("user", prompt))
+        self.history.append(make_message("model", text))
+        return ModelResponse(text, route.model, latency)
+
+
+# --- Configuration ---
+# ASSISTANT_BACKEND        gemini (default) | local
+# ASSISTANT_LOCAL_URL      base URL of the OpenAI-compatible server
+# ASSISTANT_LOCAL_MODELS   comma separated model names for the local backend
+# ASSISTANT_CASSETTES      directory for record/replay cassettes
+# ASSISTANT_CASSETTE_MODE  record | replay
+# ASSISTANT_REPLAY_SPEED   replay timing factor (2.0 = twice as fast, 0 = no delay)
+# modelle.json (optional)  list of routes overriding the defaults, e.g.
+#   [{"backend": "local", "model": "llama3", "cost": 0, "tier": 1, "latency": 5}]
+
+def needs_api_key(env=None):
+    env = os.environ if env is None else env
+    if env.get("ASSISTANT_CASSETTE_MODE") == "replay":
+        return False
+    return any(spec.get("backend", "gemini") == "gemini" for spec in load_route_specs(env))
+
+
+def load_route_specs(env=None, routes_file=ROUTES_FILE):
+    env = os.environ if env is None else env
+    if os.path.exists(routes_file):
+        with open(routes_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    if env.get("ASSISTANT_BACKEND", "gemini") == "local":
+        models = [m.strip() for m in env.get("ASSISTANT_LOCAL_MODELS", "llama3.1").split(",") if m.strip()]
+        # Listed from small to large: later models are assumed slower and more capable
+        return [
+            {"backend": "local", "model": model, "cost": 0.0, "tier": min(index + 1, 2), "latency": 4.0 * (index + 1)}
+            for index, model in enumerate(models)
+        ]
+    return DEFAULT_ROUTES
+
+
+def create_router_from_env(api_key=None, env=None):
+    env = os.environ if env is None else env
+    specs = load_route_specs(env)
+    cassette_mode = env.get("ASSISTANT_CASSETTE_MODE")
+    cassette_dir = env.get("ASSISTANT_CASSETTES", "cassettes")
+    speed = float(env.get("ASSISTANT_REPLAY_SPEED", "1.0"))
+
+    backends = {}
+
+    def get_backend(kind):
+        if kind not in backends:
+            if cassette_mode == "replay":
+                backend = None
+            elif kind == "gemini":
+                backend = GeminiBackend(api_key)
+            elif kind == "local":
+                backend = OpenAICompatibleBackend(env.get("ASSISTANT_LOCAL_URL", "http://localhost:11434/v1"), env.get("ASSISTANT_LOCAL_API_KEY"))
+            else:
+                raise ValueError(f"Unbekanntes Backend: {kind}")
+            if cassette_mode:
+                backend = RecordReplayBackend(backend, cassette_dir, cassette_mode, speed)
+            backends[kind] = backend
+        return backends[kind]
+
+    routes = [
+        ModelRoute(get_backend(spec.get("backend", "gemini")), spec["model"], spec.get("cost", 1.0), spec.get("tier", 1), spec.get("latency", 5.0), spec.get("backend", "gemini"))
+        for spec in specs
+    ]
+    return ModelRouter(routes)
@@ -1,45 +1,96 @@
 import customtkinter as ctk
-import csv
+import io
 import os
-import json
-import re
+import queue
 import datetime
+import threading
 from PIL import Image
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+import projekt_core
+import model_backends
+import task_index
+import autosave
+import snapshot_store
+import session_manager
+import ui_scheduler
+import workspace_cache
+import assistant_daemon
+import session_state
+import job_system
 
-load_dotenv()
-# --- Configure your Gemini API Key ---
-# It's recommended to set this as an environment variable for security.
-# If the environment variable is not set, the program will prompt for the key.
-API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not API_KEY:
-    # This is a simple way to get the key, but a more robust solution
-    # might be needed for a real application.
-    root = ctk.CTk()
-    root.withdraw() # Hide the main window
-    API_KEY = ctk.CTkInputDialog(text="Please enter your Gemini API Key:", title="API Key").get_input()
-    root.destroy()
 
+load_dotenv()
 
-genai.configure(api_key=API_KEY)
+ALL_FILTER = "Alle"
+UI_QUEUE_POLL_MS = 100
+TASK_INDEX_REFRESH_MS = 60000
+
+SAVE_STATE_TEXTS = {
+    autosave.STATE_CLEAN: "",
+    autosave.STATE_DIRTY: "● Ungespeichert",
+    autosave.STATE_SAVING: "Speichert...",
+    autosave.STATE_CONFLICT: "⚠ Extern geändert",
+    autosave.STATE_ERROR: "⚠ Fehler beim Speichern",
+}
+
+VERSIONS_PLACEHOLDER = "Versionen..."
+CHAT_MENU_PLACEHOLDERS = ["Bestehenden Chat wählen...", "Keine Chats vorhanden", "Keine Treffer"]
+# When a chat is shown, these newest messages are rendered before the older ones
+CHAT_NEWEST_FIRST = 4
+TODO_LINES_PER_SLICE = 200
+TASK_LINES_PER_SLICE = 100
+
+
+def get_api_key():
+    # --- Configure your Gemini API Key ---
+    # It's recommended to set this as an environment variable for security.
+    # If the environment variable is not set, the program will prompt for the key.
+    api_key = os.getenv("GEMINI_API_KEY")
+
+    if not api_key:
+        # This is a simple way to get the key, but a more robust solution
+        # might be needed for a real application.
+        root = ctk.CTk()
+        root.withdraw() # Hide the main window
+        api_key = ctk.CTkInputDialog(text="Please enter your Gemini API Key:", title="API Key").get_input()
+        root.destroy()
+    return api_key
 
 
 class ProjectAssistantApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, router, workspace=None):
         super().__init__()
 
         self.title("Gemini Projekt-Assistent v2")
         self.geometry("1400x800")
 
-        # Initialize Gemini Model
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
-        self.chat = None # Will be initialized when a project/chat is selected
-        self.current_chat_file = None
+        # Model routing (Gemini, local server or record/replay, see model_backends)
+        self.router = router
+        # Cached project scans, thumbnails and task index; in daemon mode shared by all windows
+        self.workspace = workspace or workspace_cache.WorkspaceCache()
         self.currently_editing_file = None
 
+        # Background workers hand their results to the Tk thread through this queue
+        self.ui_queue = queue.Queue()
+        # Open chats of all projects; self.session is the one shown in the chat tab
+        self.sessions = session_manager.SessionManager(router, self.run_on_ui_thread)
+        self.session = None
+        # Large widget updates are sliced into frame-sized steps (see ui_scheduler)
+        self.ui_scheduler = ui_scheduler.UIScheduler(self)
+        # CPU-heavy parsing and decoding runs in worker processes, grouped by project
+        self.jobs = job_system.JobSystem(self.run_on_ui_thread)
+        self.job_labels = {}   # job id -> text for the progress display
+        self.chat_search_indexes = {}   # project path -> (chat file signatures, token index)
+        self.kicad_summaries = {}   # (path, signature) pairs -> summary
+        # Editor and TODO buffers are saved atomically by one background writer
+        self.autosave_writer = autosave.AutosaveWriter()
+        self.todo_autosave = None
+        # Versions are snapshotted per project right before an AI, manual or first save
+        self.snapshot_stores = {}
+        self.snapshot_lock = threading.Lock()
+        self.autosave_writer.before_write.append(self.snapshot_before_write)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Haupt-Grid konfigurieren (3 Spalten: Projektliste, Chatbereich, Projekt-Infos)
         self.grid_columnconfigure(0, weight=0, minsize=250)
@@ -57,24 +108,38 @@ class ProjectAssistantApp(ctk.CTk):
 
         self.project_list_frame = ctk.CTkScrollableFrame(self.project_frame, label_text="")
         self.project_list_frame.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+
+        # Progress of background jobs, only visible while some are running
+        self.job_status_frame = ctk.CTkFrame(self.project_frame, fg_color="transparent")
+        self.job_status_frame.grid(row=2, column=0, padx=10, pady=(0, 10), sticky="ew")
+        self.job_status_label = ctk.CTkLabel(self.job_status_frame, text="", anchor="w")
+        self.job_status_label.pack(fill="x")
+        self.job_progress_bar = ctk.CTkProgressBar(self.job_status_frame)
+        self.job_progress_bar.pack(fill="x")
+        self.job_status_frame.grid_remove()
         
         self.projects = []
         self.load_projects()
 
         # --- Mittlerer Frame (Tabs für Chat, Todo, etc.) ---
-        self.tab_view = ctk.CTkTabview(self, corner_radius=8)
+        self.tab_view = ctk.CTkTabview(self, corner_radius=8, command=self.on_tab_changed)
         self.tab_view.grid(row=0, column=1, padx=(20, 20), pady=(10, 0), sticky="nsew")
         self.tab_view.add("Chat")
         self.tab_view.add("To-Do")
         self.tab_view.add("Dateien")
+        self.tab_view.add("Aufgaben")
 
         # --- Chat-Tab ---
         self.tab_view.tab("Chat").grid_columnconfigure(0, weight=1)
-        self.tab_view.tab("Chat").grid_rowconfigure(1, weight=1)
+        self.tab_view.tab("Chat").grid_rowconfigure(2, weight=1)
+
+        # One entry per open chat session, across projects
+        self.session_bar = ctk.CTkScrollableFrame(self.tab_view.tab("Chat"), orientation="horizontal", height=36)
+        self.session_bar.grid(row=0, column=0, padx=10, pady=(5, 0), sticky="ew")
         
         # Frame for chat selection
         self.chat_selection_frame = ctk.CTkFrame(self.tab_view.tab("Chat"))
-        self.chat_selection_frame.grid(row=0, column=0, padx=10, pady=5, sticky="ew")
+        self.chat_selection_frame.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
         
         self.new_chat_button = ctk.CTkButton(self.chat_selection_frame, text="Neuer Chat", command=self.start_new_chat)
         self.new_chat_button.pack(side="left", padx=(0, 10))
@@ -82,9 +147,13 @@ class ProjectAssistantApp(ctk.CTk):
         self.chat_history_menu = ctk.CTkOptionMenu(self.chat_selection_frame, values=["Bestehenden Chat wählen..."])
         self.chat_history_menu.configure(command=self.load_selected_chat)
         self.chat_history_menu.pack(side="left", fill="x", expand=True)
+
+        self.chat_search_entry = ctk.CTkEntry(self.chat_selection_frame, placeholder_text="Chats durchsuchen...", width=180)
+        self.chat_search_entry.pack(side="left", padx=(10, 0))
+        self.chat_search_entry.bind("<Return>", lambda event: self.search_chats())
         
         self.chat_display = ctk.CTkTextbox(self.tab_view.tab("Chat"), state="disabled", wrap="word")
-        self.chat_display.grid(row=1, column=0, padx=10, pady=5, sticky="nsew")
+        self.chat_display.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
 
         # Configure tags for markdown rendering
         self.chat_display.tag_config("bold", underline=True)
@@ -104,6 +173,7 @@ class ProjectAssistantApp(ctk.CTk):
 
         self.file_browser_frame = ctk.CTkScrollableFrame(self.tab_view.tab("Dateien"), label_text="Projektdateien")
         self.file_browser_frame.grid(row=0, column=0, rowspan=2, padx=10, pady=10, sticky="nsew")
+        self.file_tree_container = None
 
         self.file_editor_frame = ctk.CTkFrame(self.tab_view.tab("Dateien"))
         self.file_editor_frame.grid(row=0, column=1, rowspan=2, padx=10, pady=10, sticky="nsew")
@@ -113,13 +183,23 @@ class ProjectAssistantApp(ctk.CTk):
 
         self.opened_file_label = ctk.CTkLabel(self.file_editor_frame, text="Keine Datei geöffnet", font=ctk.CTkFont(size=14))
         self.opened_file_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
+
+        self.file_save_state_label = ctk.CTkLabel(self.file_editor_frame, text="")
+        self.file_save_state_label.grid(row=0, column=1, padx=10, pady=5, sticky="e")
         
         self.file_editor_textbox = ctk.CTkTextbox(self.file_editor_frame, wrap="word", font=("Consolas", 12))
         self.file_editor_textbox.grid(row=1, column=0, columnspan=2, padx=10, pady=5, sticky="nsew")
+        self.editor_autosave = autosave.AutosaveBuffer(self, self.file_editor_textbox, self.autosave_writer, self.run_on_ui_thread,
+                                                       on_state=lambda state, detail: self.show_save_state(self.editor_autosave, self.file_save_state_label, state, detail),
+                                                       on_saved=self.on_opened_file_saved, on_lost=self.on_unsaved_edits)
 
         self.file_editor_buttons_frame = ctk.CTkFrame(self.file_editor_frame, fg_color="transparent")
         self.file_editor_buttons_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=10, sticky="e")
 
+        self.file_versions_menu = ctk.CTkOptionMenu(self.file_editor_buttons_frame, values=[VERSIONS_PLACEHOLDER], command=self.restore_file_version)
+        self.file_versions_menu.pack(side="left", padx=(0, 10))
+        self.file_version_hashes = {}
+
         self.file_save_button = ctk.CTkButton(self.file_editor_buttons_frame, text="Speichern", command=self.save_opened_file)
         self.file_save_button.pack(side="left", padx=(0, 10))
         
@@ -127,6 +207,35 @@ class ProjectAssistantApp(ctk.CTk):
         self.file_close_button.pack(side="left")
 
 
+        # --- Aufgaben-Tab (Aufgaben aller Projekte) ---
+        self.tab_view.tab("Aufgaben").grid_columnconfigure(0, weight=1)
+        self.tab_view.tab("Aufgaben").grid_rowconfigure(1, weight=1)
+
+        self.task_filter_frame = ctk.CTkFrame(self.tab_view.tab("Aufgaben"), fg_color="transparent")
+        self.task_filter_frame.grid(row=0, column=0, padx=10, pady=5, sticky="ew")
+
+        self.task_project_filter = ctk.CTkOptionMenu(self.task_filter_frame, values=[ALL_FILTER], command=lambda _: self.update_task_dashboard())
+        self.task_project_filter.pack(side="left", padx=(0, 10))
+        self.task_type_filter = ctk.CTkOptionMenu(self.task_filter_frame, values=[ALL_FILTER], command=lambda _: self.update_task_dashboard())
+        self.task_type_filter.pack(side="left", padx=(0, 10))
+        self.task_status_filter = ctk.CTkOptionMenu(self.task_filter_frame, values=[ALL_FILTER, task_index.STATUS_OPEN, task_index.STATUS_DONE], command=lambda _: self.update_task_dashboard())
+        self.task_status_filter.set(task_index.STATUS_OPEN)
+        self.task_status_filter.pack(side="left", padx=(0, 10))
+
+        self.task_refresh_button = ctk.CTkButton(self.task_filter_frame, text="Aktualisieren", width=110, command=self.refresh_task_index)
+        self.task_refresh_button.pack(side="left")
+        self.task_status_label = ctk.CTkLabel(self.task_filter_frame, text="")
+        self.task_status_label.pack(side="right")
+
+        self.task_textbox = ctk.CTkTextbox(self.tab_view.tab("Aufgaben"), state="disabled", wrap="word")
+        self.task_textbox.grid(row=1, column=0, padx=10, pady=5, sticky="nsew")
+        self.task_textbox.tag_config("h2", foreground="#42a5f5")
+        self.task_textbox.tag_config("done", foreground="gray50")
+        # Double click on a task (or project heading) opens that project's To-Do tab
+        self.task_textbox.bind("<Double-Button-1>", self.open_task_project)
+        self.task_line_projects = {}
+
+
         # --- Rechter Frame (Projekt-Infos) ---
         self.info_frame = ctk.CTkFrame(self, width=300, corner_radius=0)
         self.info_frame.grid(row=0, column=2, rowspan=2, sticky="nsew", padx=(0, 20))
@@ -158,6 +267,148 @@ class ProjectAssistantApp(ctk.CTk):
         self.update_todo_tab() # Initialize with empty state
         self.update_file_tree() # Initialize with empty state
 
+        self.after(UI_QUEUE_POLL_MS, self.process_ui_queue)
+
+        # The task index is shown from its on-disk cache right away and refreshed in the background
+        self.task_index = self.workspace.task_index
+        self.task_index_refresh_job = None
+        self.update_task_dashboard()
+        self.refresh_task_index()
+
+        # Warm start: show what was open at the last exit, validated in the background
+        self.warm_view = None
+        self.restore_session_state()
+
+
+    def on_close(self):
+        # Write pending edits before the window goes away
+        self.editor_autosave.detach()
+        if self.todo_autosave:
+            self.todo_autosave.detach()
+        self.autosave_writer.flush(timeout=10)
+        self.autosave_writer.close()
+        # Failed writes report back through the queue, which is not polled any more
+        self.drain_ui_queue()
+        self.save_session_state()
+        self.jobs.shutdown()
+        self.destroy()
+
+    def save_session_state(self):
+        if not self.current_project:
+            return
+        project_path = self.current_project['Pfad']
+        state = {
+            "project": {"Projektname": self.current_project['Projektname'], "Pfad": project_path},
+            "tab": self.tab_view.get(),
+            "open_file": self.currently_editing_file,
+            "chat": None,
+        }
+        try:
+            state["view"] = session_state.make_view(self.workspace, project_path)
+            session = self.session
+            if session and session.project is self.current_project and not session.loading:
+                transcript, complete = session_state.transcript_tail(session.transcript)
+                state["chat"] = {
+                    "file": session.chat_file,
+                    "signature": autosave.file_signature(session.chat_file),
+                    "transcript": transcript,
+                    "complete": complete,
+                    "scroll": self.chat_display.yview()[0],
+                }
+            session_state.save(state)
+        except OSError:
+            pass # Best effort while closing; the next launch simply starts cold
+
+    def restore_session_state(self):
+        state = session_state.load()
+        if not state:
+            return
+        project = next((p for p in self.projects if p['Projektname'] == state["project"]["Projektname"] and p['Pfad'] == state["project"]["Pfad"]), None)
+        if not project:
+            return
+
+        # The snapshot's view data stands in for the scans until validation is done
+        self.warm_view = {key: value for key, value in state["view"].items() if key != "thumbnail"}
+        if state["view"].get("thumbnail"):
+            self.warm_view["thumbnail"] = (True, session_state.thumbnail_bytes(state["view"]))
+        self.show_project(project)
+        session = None
+        chat = state.get("chat")
+        if chat:
+            session = self.sessions.open(project, chat["file"])
+            session.preview(chat["transcript"])
+            self.activate_session(session, scroll=chat["scroll"])
+        else:
+            self.update_chat_history_menu()
+        if state.get("open_file") and os.path.isfile(state["open_file"]):
+            self.open_file_in_editor(state["open_file"])
+        if state.get("tab") in ("Chat", "To-Do", "Dateien", "Aufgaben"):
+            self.tab_view.set(state["tab"])
+            self.on_tab_changed()
+
+        def worker():
+            try:
+                stale = session_state.validate(self.workspace, state)
+            except (OSError, ValueError, KeyError, TypeError):
+                stale = {"project"}
+            loaded = session.read_history() if session else None
+            self.run_on_ui_thread(self.on_session_state_validated, project, session, stale, loaded)
+
+        threading.Thread(target=worker, name="session-restore", daemon=True).start()
+
+    def on_session_state_validated(self, project, session, stale, loaded):
+        self.warm_view = None
+        if session:
+            preview = session.transcript
+            session.wake(self.router, loaded)
+            if "chat" not in stale:
+                session.transcript = preview # Same content, keep the display as it is
+            if session is self.session:
+                if "chat" in stale:
+                    self.activate_session(session)
+                else:
+                    self.send_button.configure(state="disabled" if session.in_flight else "normal")
+                    self.update_session_bar()
+            self.sessions.enforce_limits()
+
+        if self.current_project is not project or not stale:
+            return
+        if "project" in stale:
+            self.current_project = None
+            self.show_project(project)
+            self.update_chat_history_menu()
+            return
+        if "files" in stale:
+            self.update_file_tree()
+        if "info" in stale:
+            self.update_info_panel()
+        if "chats" in stale:
+            self.update_chat_history_menu()
+
+    def view_data(self, project_path, key, load):
+        # Pre-rendered data of a restored snapshot, otherwise load() from the workspace
+        if self.warm_view and self.warm_view["path"] == project_path and key in self.warm_view:
+            return self.warm_view[key]
+        return load()
+
+    def run_on_ui_thread(self, callback, *args):
+        # Safe to call from any thread
+        self.ui_queue.put((callback, args))
+
+    def process_ui_queue(self):
+        self.drain_ui_queue()
+        self.after(UI_QUEUE_POLL_MS, self.process_ui_queue)
+
+    def drain_ui_queue(self):
+        while True:
+            try:
+                callback, args = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                self.add_message_to_display("System", f"Fehler bei einer Hintergrundaktualisierung: {e}")
 
     def load_projects(self):
         csv_path = "projekte.csv"
@@ -165,10 +416,7 @@ class ProjectAssistantApp(ctk.CTk):
             self.add_message_to_display("System", f"Fehler: Die Datei projekte.csv wurde nicht gefunden unter {csv_path}")
             return
             
-        with open(csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                self.projects.append(row)
+        self.projects.extend(self.workspace.projects(csv_path))
         
         # Projekte in der GUI anzeigen
         for project in self.projects:
@@ -176,118 +424,185 @@ class ProjectAssistantApp(ctk.CTk):
             button.pack(fill="x", padx=5, pady=2)
 
     def select_project(self, project):
+        self.show_project(project)
+
+        # Continue the project's open session, otherwise its newest chat or a new one
+        session = self.sessions.latest_for_project(project)
+        if session:
+            self.activate_session(session)
+        elif self.get_chat_history_files():
+            self.load_selected_chat(self.get_chat_history_files()[0])
+        else:
+            self.start_new_chat()
+
+    def show_project(self, project):
+        # Switches the project panels; chat sessions are handled separately
+        if self.current_project is project:
+            return
+        # Results for the previous project are no longer needed
+        if self.current_project:
+            self.jobs.cancel_group(self.current_project['Pfad'])
+            self.update_job_status()
         self.current_project = project
-        self.clear_chat_display()
-        self.add_message_to_display("System", f"Kontext auf Projekt '{project['Projektname']}' gesetzt.")
-        
+        self.chat_search_entry.delete(0, "end")
         self.close_file_editor()
-        self.update_chat_history_menu()
         self.update_info_panel()
         self.update_todo_tab()
         self.update_file_tree()
-        
-        # Automatically start a new chat if no history exists
-        if not self.get_chat_history_files():
-            self.start_new_chat()
-        else:
-            self.chat = None
-            self.current_chat_file = None
-            self.add_message_to_display("System", "Wählen Sie einen Chat aus dem Menü oder starten Sie einen neuen.")
 
     def update_chat_history_menu(self):
         if not self.current_project:
-            self.chat_history_menu.configure(values=["Bestehenden Chat wählen..."])
-            self.chat_history_menu.set("Bestehenden Chat wählen...")
+            self.chat_history_menu.configure(values=[CHAT_MENU_PLACEHOLDERS[0]])
+            self.chat_history_menu.set(CHAT_MENU_PLACEHOLDERS[0])
             return
 
         history_files = self.get_chat_history_files()
+        current_name = os.path.basename(self.session.chat_file) if self.session else None
+        if current_name and current_name not in history_files:
+            history_files.insert(0, current_name) # New chat, not written yet
         if history_files:
             self.chat_history_menu.configure(values=history_files)
-            self.chat_history_menu.set(history_files[0])
-            self.load_selected_chat(history_files[0])
+            self.chat_history_menu.set(current_name or CHAT_MENU_PLACEHOLDERS[0])
         else:
-            self.chat_history_menu.configure(values=["Keine Chats vorhanden"])
-            self.chat_history_menu.set("Keine Chats vorhanden")
+            self.chat_history_menu.configure(values=[CHAT_MENU_PLACEHOLDERS[1]])
+            self.chat_history_menu.set(CHAT_MENU_PLACEHOLDERS[1])
 
     def get_chat_history_files(self):
         if not self.current_project:
             return []
-        chat_dir = os.path.join(self.current_project['Pfad'], ".chats")
-        if not os.path.exists(chat_dir):
-            return []
-        
-        files = [f for f in os.listdir(chat_dir) if f.endswith(".json")]
-        # Sort by creation time, newest first
-        files.sort(key=lambda f: os.path.getctime(os.path.join(chat_dir, f)), reverse=True)
-        return files
+        project_path = self.current_project['Pfad']
+        # A copy, the menu adds unsaved chats to it
+        return list(self.view_data(project_path, "chats", lambda: self.workspace.chat_files(project_path)))
+
+    def search_chats(self):
+        # The token index of the project's chats is built in a worker process and
+        # reused until a chat file changes
+        query = self.chat_search_entry.get().strip()
+        if not self.current_project:
+            return
+        if not query:
+            self.update_chat_history_menu()
+            return
+
+        project_path = self.current_project['Pfad']
+        chat_dir = projekt_core.get_chat_dir(project_path)
+        chat_files = [os.path.join(chat_dir, name) for name in self.get_chat_history_files()]
+        key = tuple((path, autosave.file_signature(path)) for path in chat_files)
+        cached = self.chat_search_indexes.get(project_path)
+        if cached and cached[0] == key:
+            self.show_chat_search_results(query, cached[1])
+            return
+
+        def on_indexed(result, error):
+            if error:
+                self.add_message_to_display("System", f"Fehler beim Durchsuchen der Chats: {error}")
+                return
+            self.chat_search_indexes[project_path] = (key, result)
+            self.show_chat_search_results(query, result)
+
+        self.run_job(job_system.JOB_TOKENIZE_CHATS, (chat_files,), "Chats werden indexiert", on_indexed)
+
+    def show_chat_search_results(self, query, index):
+        names = job_system.search_chat_index(index, query)
+        matches = [name for name in self.get_chat_history_files() if name in names]
+        if matches:
+            self.chat_history_menu.configure(values=matches)
+            self.chat_history_menu.set(f"{len(matches)} Treffer für '{query}'")
+        else:
+            self.chat_history_menu.configure(values=[CHAT_MENU_PLACEHOLDERS[2]])
+            self.chat_history_menu.set(CHAT_MENU_PLACEHOLDERS[2])
 
     def start_new_chat(self):
         if not self.current_project:
             self.add_message_to_display("System", "Bitte zuerst ein Projekt auswählen.")
             return
-            
-        self.chat = self.model.start_chat(history=[])
         
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        self.current_chat_file = os.path.join(self.current_project['Pfad'], ".chats", f"chat_{timestamp}.json")
+        chat_file = os.path.join(projekt_core.get_chat_dir(self.current_project['Pfad']), f"chat_{timestamp}.json")
         
-        self.clear_chat_display()
+        self.activate_session(self.sessions.open(self.current_project, chat_file))
+        self.add_message_to_display("System", f"Kontext auf Projekt '{self.current_project['Projektname']}' gesetzt.")
         self.add_message_to_display("System", "Neuer Chat gestartet. Der Verlauf wird gespeichert.")
-        self.update_chat_history_menu()
-        self.chat_history_menu.set(os.path.basename(self.current_chat_file))
 
 
     def load_selected_chat(self, chat_file_name):
-        if not self.current_project or chat_file_name in ["Bestehenden Chat wählen...", "Keine Chats vorhanden"]:
+        if not self.current_project or chat_file_name in CHAT_MENU_PLACEHOLDERS:
             return
 
-        self.current_chat_file = os.path.join(self.current_project['Pfad'], ".chats", chat_file_name)
-        
-        try:
-            with open(self.current_chat_file, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-            
-            self.chat = self.model.start_chat(history=history)
+        chat_file = os.path.join(projekt_core.get_chat_dir(self.current_project['Pfad']), chat_file_name)
+        self.activate_session(self.sessions.open(self.current_project, chat_file))
+
+    def activate_session(self, session, scroll=None):
+        self.sessions.activate(session)
+        self.session = session
+        self.show_project(session.project)
+
+        # Show the session's transcript: the newest messages right away, the older
+        # ones are filled in above them in frame-sized slices
+        self.clear_chat_display()
+        transcript = list(session.transcript)
+        split = max(len(transcript) - CHAT_NEWEST_FIRST, 0)
+        for sender, message in transcript[split:]:
+            self.render_message(sender, message)
+
+        def restore_scroll():
+            if scroll is not None:
+                self.after_idle(lambda: self.chat_display.yview_moveto(scroll))
+
+        if split:
+            self.chat_display.mark_set("history_end", "1.0")
+            self.chat_display.mark_gravity("history_end", "right")
+            self.ui_scheduler.submit("chat", self.render_older_messages(transcript[:split]), ui_scheduler.PRIORITY_VISIBLE, on_done=restore_scroll)
+        else:
+            restore_scroll()
+
+        self.send_button.configure(state="disabled" if session.in_flight or session.loading else "normal")
+        self.update_chat_history_menu()
+        self.update_session_bar()
+
+    def close_session(self, session):
+        if not self.sessions.close(session):
+            self.add_message_to_display("System", "Die Sitzung wartet noch auf eine Antwort und kann erst danach geschlossen werden.")
+            return
+        if session is self.session:
+            self.session = None
+            remaining = sorted(self.sessions.sessions, key=lambda s: s.last_active, reverse=True)
+            if remaining:
+                self.activate_session(remaining[0])
+                return
             self.clear_chat_display()
-            self.add_message_to_display("System", f"Chat '{chat_file_name}' geladen.")
-            
-            # Display the loaded history
-            for message in history:
-                # Simple check for role, might need adjustment based on actual history format
-                sender = "Sie" if message['role'] == 'user' else "Gemini"
-                # Assuming 'parts' contains a list of text parts.
-                self.add_message_to_display(sender, "".join(part['text'] for part in message['parts']))
+            self.send_button.configure(state="normal")
+            self.update_chat_history_menu()
+        self.update_session_bar()
 
-        except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-            self.add_message_to_display("System", f"Fehler beim Laden des Chats: {e}")
-            self.chat = self.model.start_chat(history=[]) # Start a fresh chat
+    def update_session_bar(self):
+        for widget in self.session_bar.winfo_children():
+            widget.destroy()
 
-    def save_chat_history(self):
-        if not self.chat or not self.current_chat_file:
+        for session in self.sessions.sessions:
+            if session.in_flight:
+                prefix = "⏳ "
+            elif session.unread:
+                prefix = "● "
+            elif session.hibernated and not session.loading:
+                prefix = "💤 "
+            else:
+                prefix = ""
+            frame = ctk.CTkFrame(self.session_bar, fg_color=("gray75", "gray30") if session is self.session else "transparent")
+            frame.pack(side="left", padx=(0, 5))
+            button = ctk.CTkButton(frame, text=prefix + session.title(), fg_color="transparent", width=40, command=lambda s=session: self.activate_session(s))
+            button.pack(side="left")
+            close_button = ctk.CTkButton(frame, text="✕", fg_color="transparent", width=24, command=lambda s=session: self.close_session(s))
+            close_button.pack(side="left")
+
+    def save_chat_history(self, session):
+        if not session.chat:
             return
 
-        chat_dir = os.path.dirname(self.current_chat_file)
-        if not os.path.exists(chat_dir):
-            os.makedirs(chat_dir)
-            
-        # The history is already in the correct format in self.chat.history
-        history_to_save = []
-        for message in self.chat.history:
-            # Convert Gemini's internal Message object to a serializable dict
-            history_to_save.append({
-                'role': message.role,
-                'parts': [part.text for part in message.parts] # Extract text from parts
-            })
-
-        with open(self.current_chat_file, 'w', encoding='utf-8') as f:
-            # We need to re-format the dictionary to match the expected format for start_chat
-            reformatted_history = []
-            for item in history_to_save:
-                reformatted_history.append({
-                    "role": item["role"],
-                    "parts": [{"text": part} for part in item["parts"]]
-                })
-            json.dump(reformatted_history, f, indent=2)
+        is_new = not os.path.exists(session.chat_file)
+        session.save_history()
+        if is_new:
+            self.workspace.invalidate(session.project['Pfad'])
 
 
     def update_info_panel(self):
@@ -296,29 +611,14 @@ class ProjectAssistantApp(ctk.CTk):
             widget.destroy()
 
         if not self.current_project:
+            self.ui_scheduler.cancel("info")
             label = ctk.CTkLabel(self.info_content_frame, text="Kein Projekt ausgewählt.")
             label.pack(pady=10, padx=10)
             return
-        
-        project_path = self.current_project['Pfad']
-        
-        # --- Project Photo ---
-        photo_path = os.path.join(project_path, "project_photo.png")
-        if os.path.exists(photo_path):
-            try:
-                img = Image.open(photo_path)
-                ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(260, 150))
-                img_label = ctk.CTkLabel(self.info_content_frame, image=ctk_img, text="")
-                img_label.pack(pady=(0,15))
-            except Exception as e:
-                error_label = ctk.CTkLabel(self.info_content_frame, text=f"Fehler beim Laden des Bildes:\n{e}", wraplength=260)
-                error_label.pack(pady=(0,15))
-        else:
-            placeholder = ctk.CTkFrame(self.info_content_frame, width=260, height=150, fg_color="gray50")
-            placeholder_label = ctk.CTkLabel(placeholder, text="Kein Projektbild\n(project_photo.png)")
-            placeholder_label.pack(expand=True)
-            placeholder.pack(pady=(0,15))
 
+        self.ui_scheduler.submit("info", self.build_info_panel(self.current_project['Pfad']), ui_scheduler.PRIORITY_VISIBLE)
+
+    def build_info_panel(self, project_path):
         # --- Project Details ---
         def create_info_row(label_text, value_text):
             frame = ctk.CTkFrame(self.info_content_frame, fg_color="transparent")
@@ -327,102 +627,353 @@ class ProjectAssistantApp(ctk.CTk):
             label.pack(side="left")
             value = ctk.CTkLabel(frame, text=value_text, anchor="e", wraplength=180)
             value.pack(side="right", fill="x", expand=True)
+            return value
+
+        # The photo slot comes first, so it is reserved before the image is decoded
+        photo_slot = ctk.CTkFrame(self.info_content_frame, width=260, height=150, fg_color="gray50")
+        photo_slot.pack(pady=(0,15))
+        yield
 
         try:
             stat = os.stat(project_path)
             create_info_row("Erstellt:", datetime.datetime.fromtimestamp(stat.st_ctime).strftime('%d.%m.%Y'))
             create_info_row("Letzte Änderung:", datetime.datetime.fromtimestamp(stat.st_mtime).strftime('%d.%m.%Y %H:%M'))
+            yield
 
             # Find last modified file
-            last_mod_file, last_mod_time = "", 0
-            for item in os.listdir(project_path):
-                item_path = os.path.join(project_path, item)
-                if os.path.isfile(item_path):
-                    mod_time = os.path.getmtime(item_path)
-                    if mod_time > last_mod_time:
-                        last_mod_time = mod_time
-                        last_mod_file = item
+            last_mod_file = self.view_data(project_path, "last_modified", lambda: self.workspace.last_modified_file(project_path)[0])
             create_info_row("Zuletzt bearbeitet:", last_mod_file)
+            yield
+
+            # KiCad schematics and boards are parsed in a worker process
+            entries = self.view_data(project_path, "files", lambda: self.workspace.scan_project(project_path))
+            kicad_files = [item_path for item, item_path, is_dir in entries if not is_dir and item.endswith(job_system.KICAD_EXTENSIONS)]
+            if kicad_files:
+                self.show_kicad_summary(create_info_row("KiCad:", "Wird analysiert..."), kicad_files)
+                yield
 
         except FileNotFoundError:
             create_info_row("Fehler:", "Projektpfad nicht gefunden.")
 
+        # --- Project Photo ---
+        # Decoded in a worker process once, then served from the workspace cache
+        photo_path = os.path.join(project_path, projekt_core.PROJECT_PHOTO_NAME)
+        found, thumbnail = self.view_data(project_path, "thumbnail", lambda: self.workspace.peek_thumbnail(photo_path))
+        if found:
+            self.show_project_photo(photo_slot, thumbnail)
+            return
+
+        loading_label = ctk.CTkLabel(photo_slot, text="Bild wird geladen...")
+        loading_label.pack(expand=True)
+
+        def on_decoded(result, error):
+            if not error:
+                self.workspace.put_thumbnail(photo_path, result)
+            if photo_slot.winfo_exists():
+                self.show_project_photo(photo_slot, result, error)
+
+        self.run_job(job_system.JOB_DECODE_IMAGE, (photo_path,), "Projektbild wird geladen", on_decoded)
+
+    def show_project_photo(self, photo_slot, thumbnail, error=None):
+        for widget in photo_slot.winfo_children():
+            widget.destroy()
+        try:
+            if error:
+                raise error
+            img = Image.open(io.BytesIO(thumbnail)) if thumbnail else None
+        except Exception as e:
+            error_label = ctk.CTkLabel(photo_slot, text=f"Fehler beim Laden des Bildes:\n{e}", wraplength=260)
+            error_label.pack(expand=True)
+            return
+
+        if img is not None:
+            ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(260, 150))
+            img_label = ctk.CTkLabel(photo_slot, image=ctk_img, text="")
+            photo_slot.configure(fg_color="transparent")
+            img_label.pack(expand=True)
+        else:
+            placeholder_label = ctk.CTkLabel(photo_slot, text="Kein Projektbild\n(project_photo.png)")
+            placeholder_label.pack(expand=True)
+
+    def show_kicad_summary(self, value_label, kicad_files):
+        key = tuple((path, autosave.file_signature(path)) for path in kicad_files)
+        if key in self.kicad_summaries:
+            value_label.configure(text=self.format_kicad_summary(self.kicad_summaries[key]))
+            return
+
+        def on_parsed(result, error):
+            if not error:
+                self.kicad_summaries[key] = result
+            if value_label.winfo_exists():
+                value_label.configure(text=f"Fehler: {error}" if error else self.format_kicad_summary(result))
+
+        self.run_job(job_system.JOB_PARSE_KICAD, (kicad_files,), "KiCad-Dateien werden analysiert", on_parsed)
+
+    def format_kicad_summary(self, summary):
+        lines = []
+        if summary["title"]:
+            lines.append(summary["title"])
+        if summary["schematics"]:
+            lines.append(f"{summary['symbols']} Bauteile ({summary['schematics']} Schaltplan-Dateien)")
+        if summary["boards"]:
+            lines.append(f"{summary['footprints']} Footprints ({summary['boards']} Platinen-Dateien)")
+        lines.extend(f"Fehler: {error}" for error in summary["errors"])
+        return "\n".join(lines) or "Keine Daten"
+
+    # --- Background jobs ---
+
+    def run_job(self, kind, args, label, on_done):
+        # Runs a job for the current project; on_done(result, error) runs on the Tk thread
+        job = self.jobs.submit(kind, args, group=self.current_project['Pfad'],
+                               on_done=lambda job, result, error: self.on_job_done(job, result, error, on_done),
+                               on_progress=lambda job, done, total: self.update_job_status())
+        self.job_labels[job.id] = label
+        self.update_job_status()
+        return job
+
+    def on_job_done(self, job, result, error, on_done):
+        self.job_labels.pop(job.id, None)
+        self.update_job_status()
+        on_done(result, error)
+
+    def update_job_status(self):
+        running = [job for job in self.jobs.running() if job.id in self.job_labels]
+        self.job_labels = {job.id: self.job_labels[job.id] for job in running}
+        if not running:
+            self.job_status_frame.grid_remove()
+            return
+        text = self.job_labels[running[0].id]
+        if len(running) > 1:
+            text += f" (+{len(running) - 1})"
+        fractions = [done / total if total else 0.0 for done, total in (job.progress for job in running)]
+        self.job_status_label.configure(text=text)
+        self.job_progress_bar.set(sum(fractions) / len(fractions))
+        self.job_status_frame.grid()
+
     def update_todo_tab(self):
+        # Write pending edits of the previous TODO.md before its textbox goes away
+        if self.todo_autosave:
+            self.todo_autosave.detach()
+            self.todo_autosave = None
+
         # Clear previous content
         for widget in self.tab_view.tab("To-Do").winfo_children():
             widget.destroy()
 
         if not self.current_project:
+            self.ui_scheduler.cancel("todo")
             label = ctk.CTkLabel(self.tab_view.tab("To-Do"), text="Kein Projekt ausgewählt.")
             label.pack(pady=20, padx=20)
             return
 
-        todo_path = os.path.join(self.current_project['Pfad'], "TODO.md")
+        todo_path = os.path.join(self.current_project['Pfad'], projekt_core.TODO_FILE_NAME)
         
         if os.path.exists(todo_path):
             self.todo_textbox = ctk.CTkTextbox(self.tab_view.tab("To-Do"), wrap="word")
             self.todo_textbox.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
             with open(todo_path, "r", encoding="utf-8") as f:
-                self.todo_textbox.insert("0.0", f.read())
+                content = f.read()
+
+            project_name = self.current_project['Projektname']
+            self.todo_autosave = autosave.AutosaveBuffer(self, self.todo_textbox, self.autosave_writer, self.run_on_ui_thread,
+                                                         on_state=lambda state, detail: self.show_save_state(self.todo_autosave, self.todo_save_state_label, state, detail),
+                                                         on_saved=lambda path, notify: self.on_todo_file_saved(project_name, notify),
+                                                         on_lost=self.on_unsaved_edits)
+
+            self.todo_save_state_label = ctk.CTkLabel(self.tab_view.tab("To-Do"), text="")
+            self.todo_save_state_label.grid(row=1, column=0, padx=10, pady=10, sticky="sw")
             
             self.todo_save_button = ctk.CTkButton(self.tab_view.tab("To-Do"), text="Speichern", command=self.save_todo_file)
             self.todo_save_button.grid(row=1, column=0, padx=10, pady=10, sticky="se")
+
+            # Autosave only starts once the whole file is in the textbox
+            buffer = self.todo_autosave
+            self.ui_scheduler.submit("todo", self.insert_text_in_slices(self.todo_textbox, content, TODO_LINES_PER_SLICE),
+                                     self.tab_priority("To-Do"), on_done=lambda: buffer.attach(todo_path, content))
         else:
+            self.ui_scheduler.cancel("todo")
             create_button = ctk.CTkButton(self.tab_view.tab("To-Do"), text="TODO.md erstellen", command=self.create_todo_file)
             create_button.pack(pady=20, padx=20)
 
     def create_todo_file(self):
         if not self.current_project:
             return
-        todo_path = os.path.join(self.current_project['Pfad'], "TODO.md")
-        with open(todo_path, "w", encoding="utf-8") as f:
-            f.write("# To-Do-Liste für " + self.current_project['Projektname'] + "\n\n")
+        todo_path = os.path.join(self.current_project['Pfad'], projekt_core.TODO_FILE_NAME)
+        autosave.atomic_write(todo_path, "# To-Do-Liste für " + self.current_project['Projektname'] + "\n\n")
         self.update_todo_tab()
+        self.refresh_task_index()
 
     def save_todo_file(self):
-        if not self.current_project:
+        if not self.current_project or not self.todo_autosave:
             return
-        todo_path = os.path.join(self.current_project['Pfad'], "TODO.md")
-        with open(todo_path, "w", encoding="utf-8") as f:
-            f.write(self.todo_textbox.get("0.0", "end"))
-        self.add_message_to_display("System", f"TODO.md für Projekt '{self.current_project['Projektname']}' gespeichert.")
+        self.ui_scheduler.run_now("todo")
+        self.todo_autosave.save_now()
+
+    def on_todo_file_saved(self, project_name, notify):
+        if notify:
+            self.add_message_to_display("System", f"TODO.md für Projekt '{project_name}' gespeichert.")
+        self.refresh_task_index()
+
+    def show_save_state(self, buffer, label, state, detail):
+        try:
+            label.configure(text=SAVE_STATE_TEXTS[state])
+        except Exception:
+            return # Label already destroyed (project switched)
+        filename = os.path.basename(buffer.path) if buffer and buffer.path else ""
+        if state == autosave.STATE_CONFLICT:
+            self.add_message_to_display("System", f"Die Datei '{filename}' wurde außerhalb des Assistenten geändert und nicht automatisch gespeichert. Klicken Sie auf 'Speichern', um sie zu überschreiben, oder öffnen Sie sie neu, um die externe Version zu laden.")
+        elif state == autosave.STATE_ERROR:
+            self.add_message_to_display("System", f"Fehler beim Speichern der Datei '{filename}': {detail}")
+
+    def refresh_task_index(self):
+        # Incremental: only TODO.md files with a new mtime/size are parsed again
+        started = self.task_index.refresh_in_background(list(self.projects), lambda changed, error: self.run_on_ui_thread(self.on_task_index_refreshed, changed, error))
+        if started:
+            self.task_status_label.configure(text="Aktualisiere...")
+
+    def on_task_index_refreshed(self, changed, error=None):
+        if changed:
+            self.update_task_dashboard()
+        if error:
+            self.task_status_label.configure(text=f"Fehler beim Aktualisieren: {error}")
+        else:
+            self.task_status_label.configure(text="Stand: " + datetime.datetime.now().strftime('%H:%M:%S'))
+        # Rescheduled in any case, so a failed refresh is retried
+        if self.task_index_refresh_job:
+            self.after_cancel(self.task_index_refresh_job)
+        self.task_index_refresh_job = self.after(TASK_INDEX_REFRESH_MS, self.refresh_task_index)
+
+    def update_task_dashboard(self):
+        def filter_value(option_menu):
+            value = option_menu.get()
+            return None if value == ALL_FILTER else value
+
+        project_names = [project['Projektname'] for project in self.projects]
+        types = sorted({project.get('Typ', "") for project in self.projects if project.get('Typ')})
+        self.task_project_filter.configure(values=[ALL_FILTER] + project_names)
+        self.task_type_filter.configure(values=[ALL_FILTER] + types)
+
+        results = self.task_index.query(filter_value(self.task_project_filter), filter_value(self.task_type_filter), filter_value(self.task_status_filter))
+
+        self.task_line_projects = {}
+        self.task_textbox.configure(state="normal")
+        self.task_textbox.delete("1.0", "end")
+        self.task_textbox.configure(state="disabled")
+        self.ui_scheduler.submit("tasks", self.fill_task_dashboard(results), self.tab_priority("Aufgaben"))
+
+    def fill_task_dashboard(self, results):
+        line = 1
+        last_project = None
+        self.task_textbox.configure(state="normal")
+        for count, (project_name, typ, task) in enumerate(results, 1):
+            if project_name != last_project:
+                if last_project is not None:
+                    self.task_textbox.insert("end", "\n")
+                    line += 1
+                self.task_textbox.insert("end", f"{project_name} ({typ})\n" if typ else f"{project_name}\n", "h2")
+                self.task_line_projects[line] = project_name
+                line += 1
+                last_project = project_name
+
+            section = f"{task['section']}: " if task['section'] else ""
+            if task['done']:
+                self.task_textbox.insert("end", f"  ☑ {section}{task['text']}\n", "done")
+            else:
+                self.task_textbox.insert("end", f"  ☐ {section}{task['text']}\n")
+            self.task_line_projects[line] = project_name
+            line += 1
+
+            if count % TASK_LINES_PER_SLICE == 0:
+                self.task_textbox.configure(state="disabled")
+                yield
+                self.task_textbox.configure(state="normal")
+
+        if not results:
+            self.task_textbox.insert("end", "Keine Aufgaben gefunden.")
+        self.task_textbox.configure(state="disabled")
+
+    def open_task_project(self, event):
+        line = int(self.task_textbox.index(f"@{event.x},{event.y}").split(".")[0])
+        project_name = self.task_line_projects.get(line)
+        for project in self.projects:
+            if project['Projektname'] == project_name:
+                self.select_project(project)
+                self.tab_view.set("To-Do")
+                self.on_tab_changed()
+                break
 
     def update_file_tree(self):
-        # Clear previous content
-        for widget in self.file_browser_frame.winfo_children():
-            widget.destroy()
+        # Hide the previous tree at once and tear it down in the background
+        if self.file_tree_container:
+            self.discard_container(self.file_tree_container)
+        self.file_tree_container = ctk.CTkFrame(self.file_browser_frame, fg_color="transparent")
+        self.file_tree_container.pack(fill="both", expand=True)
 
         if not self.current_project:
-            label = ctk.CTkLabel(self.file_browser_frame, text="Kein Projekt ausgewählt.")
+            self.ui_scheduler.cancel("files")
+            label = ctk.CTkLabel(self.file_tree_container, text="Kein Projekt ausgewählt.")
             label.pack(pady=10, padx=10)
             return
 
         project_path = self.current_project['Pfad']
         if not os.path.isdir(project_path):
-            label = ctk.CTkLabel(self.file_browser_frame, text="Projektpfad ist kein gültiges Verzeichnis.")
+            self.ui_scheduler.cancel("files")
+            label = ctk.CTkLabel(self.file_tree_container, text="Projektpfad ist kein gültiges Verzeichnis.")
             label.pack(pady=10, padx=10)
             return
 
-        for item in sorted(os.listdir(project_path)):
-            item_path = os.path.join(project_path, item)
-            if os.path.isdir(item_path):
+        self.ui_scheduler.submit("files", self.build_file_tree(self.file_tree_container, project_path), self.tab_priority("Dateien"))
+
+    def build_file_tree(self, container, project_path):
+        for item, item_path, is_dir in self.view_data(project_path, "files", lambda: self.workspace.scan_project(project_path)):
+            if is_dir:
                 label_text = "📁 " + item
-                label = ctk.CTkLabel(self.file_browser_frame, text=label_text, anchor="w")
+                label = ctk.CTkLabel(container, text=label_text, anchor="w")
                 label.pack(fill="x", padx=5)
             else:
                 label_text = "📄 " + item
-                button = ctk.CTkButton(self.file_browser_frame, text=label_text, anchor="w", fg_color="transparent", command=lambda path=item_path: self.open_file_in_editor(path))
+                button = ctk.CTkButton(container, text=label_text, anchor="w", fg_color="transparent", command=lambda path=item_path: self.open_file_in_editor(path))
                 button.pack(fill="x", padx=5)
-    
+            yield
+
+    def on_tab_changed(self):
+        # Pending work for the tab that just became visible moves to the front
+        for group, tab_name in (("todo", "To-Do"), ("files", "Dateien"), ("tasks", "Aufgaben")):
+            self.ui_scheduler.set_priority(group, self.tab_priority(tab_name))
+
+    def tab_priority(self, tab_name):
+        # Content of the visible tab is built first
+        return ui_scheduler.PRIORITY_VISIBLE if self.tab_view.get() == tab_name else ui_scheduler.PRIORITY_BACKGROUND
+
+    def discard_container(self, container):
+        container.pack_forget()
+
+        def destroy_in_slices():
+            for widget in container.winfo_children():
+                widget.destroy()
+                yield
+            container.destroy()
+
+        self.ui_scheduler.submit(f"discard-{id(container)}", destroy_in_slices(), ui_scheduler.PRIORITY_BACKGROUND)
+
+    def insert_text_in_slices(self, textbox, text, lines_per_slice):
+        lines = text.splitlines(keepends=True)
+        for start in range(0, len(lines), lines_per_slice):
+            textbox.insert("end-1c", "".join(lines[start:start + lines_per_slice]))
+            yield
+
     def open_file_in_editor(self, file_path):
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
+            self.editor_autosave.detach()
             self.currently_editing_file = file_path
             
             self.file_editor_textbox.delete("0.0", "end")
             self.file_editor_textbox.insert("0.0", content)
+            self.editor_autosave.attach(file_path, content)
+            self.update_file_versions_menu()
             
             self.opened_file_label.configure(text=os.path.basename(file_path))
             self.file_editor_frame.grid() # Show the editor
@@ -431,102 +982,149 @@ class ProjectAssistantApp(ctk.CTk):
         except Exception as e:
             self.add_message_to_display("System", f"Fehler beim Öffnen der Datei {os.path.basename(file_path)}: {e}")
 
-    def save_opened_file(self):
+    def save_opened_file(self, reason=autosave.REASON_MANUAL):
         if not self.currently_editing_file:
             return
-        
+        # Written atomically on the autosave thread, the result arrives in on_opened_file_saved
+        self.editor_autosave.save_now(reason)
+
+    def on_opened_file_saved(self, path, notify):
+        if notify:
+            self.add_message_to_display("System", f"Datei '{os.path.basename(path)}' erfolgreich gespeichert.")
+        self.update_file_versions_menu()
+
+    def on_background_write(self, session, path, result, detail):
+        if result == autosave.RESULT_ERROR:
+            self.post_message(session, "System", f"Fehler beim Speichern der Datei '{os.path.basename(path)}': {detail}")
+
+    def on_unsaved_edits(self, path, text, result, detail):
+        # Edits of a file that was closed or switched away from before they could be
+        # written. They are kept as a version, or shown in the chat as a last resort.
+        filename = os.path.basename(path)
+        if result == autosave.RESULT_CONFLICT:
+            problem = f"Die Datei '{filename}' wurde außerhalb des Assistenten geändert, Ihre letzten Änderungen wurden daher nicht gespeichert."
+        else:
+            problem = f"Ihre letzten Änderungen an der Datei '{filename}' konnten nicht gespeichert werden: {detail}"
+        store = self.get_snapshot_store(path)
+        try:
+            digest = store.capture_text(path, text) if store else None
+        except OSError:
+            digest = None
+        if digest:
+            self.add_message_to_display("System", f"{problem} Sie sind als Version {digest[:7]} gesichert und können nach dem Öffnen der Datei über das Versionsmenü wiederhergestellt werden.")
+        else:
+            self.add_message_to_display("System", f"{problem} Der ungespeicherte Text:\n```\n{text}\n```")
+        if path == self.currently_editing_file:
+            self.update_file_versions_menu()
+
+    def get_snapshot_store(self, path):
+        # Snapshot store of the project containing path, None outside of all projects.
+        # Also called from the autosave thread.
+        abs_path = os.path.abspath(path)
+        project_root = None
+        for project in self.projects:
+            root = os.path.abspath(project['Pfad'])
+            if abs_path.startswith(root + os.sep) and (project_root is None or len(root) > len(project_root)):
+                project_root = root
+        if not project_root:
+            return None
+        with self.snapshot_lock:
+            if project_root not in self.snapshot_stores:
+                self.snapshot_stores[project_root] = snapshot_store.SnapshotStore(project_root)
+            return self.snapshot_stores[project_root]
+
+    def snapshot_before_write(self, path, reason):
+        # Runs on the autosave thread right before path is overwritten.
+        # Plain autosaves are skipped, the version as opened is kept via REASON_OPEN.
+        if reason == autosave.REASON_AUTOSAVE:
+            return
+        store = self.get_snapshot_store(path)
+        if not store:
+            return
         try:
-            content = self.file_editor_textbox.get("0.0", "end")
-            with open(self.currently_editing_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            self.add_message_to_display("System", f"Datei '{os.path.basename(self.currently_editing_file)}' erfolgreich gespeichert.")
+            store.capture(path, reason)
         except Exception as e:
-            self.add_message_to_display("System", f"Fehler beim Speichern der Datei: {e}")
+            # E.g. a locked index.json on a synced drive; the save itself must still happen
+            self.run_on_ui_thread(self.add_message_to_display, "System", f"Vor dem Speichern von '{os.path.basename(path)}' konnte keine Version gesichert werden: {e}")
+
+    def update_file_versions_menu(self):
+        store = self.get_snapshot_store(self.currently_editing_file) if self.currently_editing_file else None
+        self.file_version_hashes = {}
+        for version in store.versions(self.currently_editing_file) if store else []:
+            timestamp = datetime.datetime.fromtimestamp(version['time']).strftime('%d.%m.%Y %H:%M:%S')
+            source = snapshot_store.SOURCE_LABELS.get(version['source'], version['source'])
+            label = f"{timestamp} · {source} · {version['hash'][:7]}"
+            self.file_version_hashes[label] = version['hash']
+        self.file_versions_menu.configure(values=[VERSIONS_PLACEHOLDER] + list(self.file_version_hashes))
+        self.file_versions_menu.set(VERSIONS_PLACEHOLDER)
+
+    def restore_file_version(self, label):
+        digest = self.file_version_hashes.get(label)
+        store = self.get_snapshot_store(self.currently_editing_file) if self.currently_editing_file else None
+        if not digest or not store:
+            return
+        try:
+            content = store.restore(digest)
+        except Exception as e:
+            self.add_message_to_display("System", f"Fehler beim Wiederherstellen der Version: {e}")
+            return
+
+        self.file_editor_textbox.delete("0.0", "end")
+        self.file_editor_textbox.insert("0.0", content)
+        # The current version on disk is snapshotted before the restored one replaces it
+        self.save_opened_file(autosave.REASON_RESTORE)
+        self.add_message_to_display("System", f"Version '{label}' von '{os.path.basename(self.currently_editing_file)}' wiederhergestellt.")
 
     def close_file_editor(self):
+        self.editor_autosave.detach()
         self.currently_editing_file = None
+        self.update_file_versions_menu()
         self.file_editor_frame.grid_remove()
         self.file_browser_frame.grid()
 
 
     def clear_chat_display(self):
+        self.ui_scheduler.cancel("chat")
         self.chat_display.configure(state="normal")
         self.chat_display.delete("1.0", "end")
         self.chat_display.configure(state="disabled")
 
     def add_message_to_display(self, sender, message):
+        # Part of the active session's transcript, so it is shown again when switching back
+        if self.session:
+            self.session.transcript.append((sender, message))
+        self.render_message(sender, message)
+
+    def post_message(self, session, sender, message):
+        # Adds a message to any session; only rendered if it is the visible one
+        if session is self.session:
+            self.add_message_to_display(sender, message)
+        else:
+            session.transcript.append((sender, message))
+
+    def render_message(self, sender, message, index="end"):
         self.chat_display.configure(state="normal")
-        self.chat_display.insert("end", f"{sender}:\n", ("bold"))
-
-        lines = message.split('\n')
-        in_code_block = False
-        code_block_content = ""
-
-        for line in lines:
-            if line.strip() == '```':
-                if in_code_block:
-                    # End of code block
-                    self.create_code_block(code_block_content)
-                    in_code_block = False
-                    code_block_content = ""
-                else:
-                    # Start of code block
-                    in_code_block = True
-                continue
+        self.chat_display.insert(index, f"{sender}:\n", ("bold"))
 
-            if in_code_block:
-                code_block_content += line + '\n'
+        for op in projekt_core.parse_markdown(message):
+            if op[0] == "code":
+                self.create_code_block(op[1], index)
+            elif op[2]:
+                self.chat_display.insert(index, op[1], op[2])
             else:
-                self.format_and_insert_line(line)
+                self.chat_display.insert(index, op[1])
 
-        self.chat_display.insert("end", "\n")
+        self.chat_display.insert(index, "\n")
         self.chat_display.configure(state="disabled")
         self.chat_display.see("end")
 
-    def format_and_insert_line(self, line):
-        # Same logic as before, but as a separate function
-        if line.startswith("### "):
-            self.chat_display.insert("end", line[4:] + "\n", "h3")
-            return
-        elif line.startswith("## "):
-            self.chat_display.insert("end", line[3:] + "\n", "h2")
-            return
-        elif line.startswith("# "):
-            self.chat_display.insert("end", line[2:] + "\n", "h1")
-            return
-        
-        list_prefix = ""
-        content_line = line
-        if line.strip().startswith("* "):
-            list_prefix = "  • "
-            content_line = line.strip()[2:]
-        elif line.strip().startswith("- "):
-            list_prefix = "  • "
-            content_line = line.strip()[2:]
-        elif re.match(r"^\s*\d+\. ", line):
-            match = re.match(r"^(\s*\d+\. )", line)
-            list_prefix = f"  {match.group(1)}"
-            content_line = line[len(match.group(0)):]
-
-        if list_prefix:
-            self.chat_display.insert("end", list_prefix)
-
-        parts = re.split(r'(\**.*?\**|\*.*?\*|`.*?`)', content_line)
-        for part in parts:
-            if not part:
-                continue
-            if part.startswith('**') and part.endswith('**'):
-                self.chat_display.insert("end", part[2:-2], "bold")
-            elif part.startswith('*') and part.endswith('*'):
-                self.chat_display.insert("end", part[1:-1], "italic")
-            elif part.startswith('`') and part.endswith('`'):
-                self.chat_display.insert("end", part[1:-1], "code")
-            else:
-                self.chat_display.insert("end", part)
-        
-        self.chat_display.insert("end", "\n")
+    def render_older_messages(self, messages):
+        # Inserted at a right-gravity mark, so they stay in order above the newest ones
+        for sender, message in messages:
+            self.render_message(sender, message, "history_end")
+            yield
 
-    def create_code_block(self, code_content):
+    def create_code_block(self, code_content, index="end"):
         code_frame = ctk.CTkFrame(self.chat_display, fg_color="#2b2b2b", corner_radius=5)
         
         code_text = ctk.CTkTextbox(code_frame, wrap="word", font=("Consolas", 12), fg_color="transparent")
@@ -544,8 +1142,8 @@ class ProjectAssistantApp(ctk.CTk):
         copy_button.pack(padx=10, pady=(0, 5), anchor="e")
 
         # This is a bit of a hack to insert a widget into a Textbox
-        self.chat_display.window_create("end", window=code_frame)
-        self.chat_display.insert("end", "\n")
+        self.chat_display.window_create(index, window=code_frame)
+        self.chat_display.insert(index, "\n")
 
     def send_message_event(self, event):
         self.send_message()
@@ -555,122 +1153,121 @@ class ProjectAssistantApp(ctk.CTk):
         if not user_input.strip():
             return
         
-        if not self.chat:
+        session = self.session
+        if session and session.loading:
+            self.add_message_to_display("System", "Der Chat wird noch geladen, bitte einen Moment.")
+            return
+        if not session or not session.chat:
             self.add_message_to_display("System", "Bitte starten Sie einen neuen Chat oder wählen Sie einen bestehenden aus.")
             return
+        if session.in_flight:
+            self.add_message_to_display("System", "Bitte warten Sie auf die Antwort der laufenden Anfrage.")
+            return
 
         self.add_message_to_display("Sie", user_input)
         self.entry.delete(0, "end")
         
         self.send_button.configure(state="disabled")
-        self.update() # Force GUI update
 
-        try:
+        # Editor content is read here on the Tk thread, the rest runs in the background
+        open_file = None
+        if self.currently_editing_file and self.tab_view.get() == "Dateien":
+            open_file = (self.currently_editing_file, self.file_editor_textbox.get("1.0", "end-1c"))
+        # File edits go to a stronger model, everything else to the cheapest fast one
+        task = model_backends.TASK_EDIT if open_file else model_backends.TASK_QUICK
+
+        def request():
             # Prepare the prompt for Gemini
-            context_parts = []
-            if self.current_project:
-                # Add project context
-                context_parts.append(f"Kontext: Du bist ein Projekt-Assistent. Das aktuelle Projekt ist '{self.current_project['Projektname']}' im Verzeichnis '{self.current_project['Pfad']}'.")
-
-                # Add content of the currently edited file to the context
-                if self.currently_editing_file and self.tab_view.get() == "Dateien":
-                    file_content = self.file_editor_textbox.get("0.0", "end")
-                    filename = os.path.basename(self.currently_editing_file)
-                    context_parts.append(f"\n--- Aktuell geöffnete Datei: {filename} ---\n{file_content}")
-
-
-                # Add file list to context if requested
-                if any(keyword in user_input.lower() for keyword in ["dateien", "files", "verzeichnis", "directory", "liste"]):
-                    try:
-                        project_path = self.current_project['Pfad']
-                        if os.path.isdir(project_path):
-                            items = os.listdir(project_path)
-                            files = [f for f in items if os.path.isfile(os.path.join(project_path, f))]
-                            dirs = [d for d in items if os.path.isdir(os.path.join(project_path, d))]
-                            
-                            file_list_str = "\n--- Verzeichnisinhalt ---\n"
-                            if dirs:
-                                file_list_str += "Ordner:\n" + "\n".join(f"- {d}" for d in sorted(dirs)) + "\n"
-                            if files:
-                                file_list_str += "Dateien:\n" + "\n".join(f"- {f}" for f in sorted(files)) + "\n"
-                            context_parts.append(file_list_str)
-                        else:
-                            context_parts.append("\n[System-Hinweis: Der Projektpfad ist ungültig.]")
-                    except Exception as e:
-                        context_parts.append(f"\n[System-Hinweis: Fehler beim Lesen des Verzeichnisses: {e}]")
-
-
-                # Add file content to context if requested by command
-                if "lies die datei" in user_input.lower() or "read the file" in user_input.lower():
-                    try:
-                        # More robust filename parsing
-                        parts = user_input.split()
-                        filename_index = -1
-                        for i, part in enumerate(parts):
-                            if part == "datei" or part == "file":
-                                if i + 1 < len(parts):
-                                    filename_index = i + 1
-                                    break
-                        
-                        if filename_index != -1:
-                            filename = parts[filename_index]
-                            filepath = os.path.join(self.current_project['Pfad'], filename)
-                            if os.path.exists(filepath) and os.path.isfile(filepath):
-                                with open(filepath, 'r', encoding='utf-8') as f:
-                                    file_content = f.read(4000) # Limit size
-                                context_parts.append(f"\n--- Inhalt von {filename} ---\n{file_content}")
-                                if len(file_content) == 4000:
-                                    context_parts.append("\n[... Datei wurde gekürzt ...]")
-                            else:
-                                self.add_message_to_display("System", f"Datei nicht gefunden oder ist ein Verzeichnis: {filename}")
-                        else:
-                            self.add_message_to_display("System", "Konnte den Dateinamen im Befehl nicht finden.")
-                    except Exception as e:
-                        self.add_message_to_display("System", f"Fehler beim Lesen der Datei: {e}")
-
-            # Combine context and the actual user query
-            final_prompt = "\n".join(context_parts)
-            if final_prompt:
-                final_prompt += f"\n\nAnfrage: {user_input}"
-            else:
-                final_prompt = user_input
-            
-            response = self.chat.send_message(final_prompt)
-            
-            # Check if Gemini wants to modify the file
-            if "---START_CODE_BLOCK---" in response.text and "---END_CODE_BLOCK---" in response.text and self.currently_editing_file:
-                try:
-                    # Extract code from the response
-                    new_content = response.text.split("---START_CODE_BLOCK---")[1].split("---END_CODE_BLOCK---")[0].strip()
-                    
+            context_parts, notices = projekt_core.build_context_parts(session.project, user_input, open_file, session.tracker)
+            final_prompt = projekt_core.compose_prompt(context_parts, user_input)
+            try:
+                response = session.chat.send_message(final_prompt, task=task)
+            except Exception:
+                session.tracker.discard()
+                raise
+            session.tracker.commit()
+            return notices, response
+
+        self.sessions.run_request(session, request, lambda s, result, error: self.handle_response(s, open_file, result, error))
+        self.update_session_bar()
+
+    def handle_response(self, session, open_file, result, error):
+        if session is self.session:
+            self.send_button.configure(state="normal")
+        else:
+            # Background completion: mark the session and give a short notice
+            self.bell()
+            self.render_message("System", f"Antwort in '{session.title()}' eingetroffen.")
+        self.update_session_bar()
+
+        if error:
+            self.post_message(session, "Error", f"Ein Fehler ist aufgetreten: {error}")
+            return
+
+        notices, response = result
+        for notice in notices:
+            self.post_message(session, "System", notice)
+
+        # Check if Gemini wants to modify the file
+        new_content = projekt_core.extract_code_block(response.text)
+        if new_content is not None and open_file:
+            file_path = open_file[0]
+            try:
+                # The model wrote this content, no need to send it back next turn
+                session.tracker.mark_seen(os.path.abspath(file_path), new_content)
+
+                if file_path == self.currently_editing_file:
                     # Update the editor
                     self.file_editor_textbox.delete("0.0", "end")
                     self.file_editor_textbox.insert("0.0", new_content)
                     
                     # Save the file automatically
-                    self.save_opened_file()
-                    
-                    # Notify the user
-                    self.add_message_to_display("Gemini", "Ich habe die Datei gemäß Ihren Anweisungen aktualisiert und gespeichert.")
-
-                except Exception as e:
-                    self.add_message_to_display("System", f"Fehler beim automatischen Aktualisieren der Datei: {e}")
-                    self.add_message_to_display("Gemini", response.text) # Show original response
-            else:
-                self.add_message_to_display("Gemini", response.text)
+                    self.save_opened_file(autosave.REASON_AI)
+                else:
+                    # The file is no longer open, write it directly (the snapshot keeps the old version)
+                    self.autosave_writer.forget(file_path)
+                    self.autosave_writer.submit(file_path, new_content, reason=autosave.REASON_AI,
+                                                on_result=lambda path, result, detail: self.run_on_ui_thread(self.on_background_write, session, path, result, detail))
+                
+                # Notify the user
+                self.post_message(session, "Gemini", f"Ich habe die Datei '{os.path.basename(file_path)}' gemäß Ihren Anweisungen aktualisiert und gespeichert.")
 
-            self.save_chat_history()
+            except Exception as e:
+                self.post_message(session, "System", f"Fehler beim automatischen Aktualisieren der Datei: {e}")
+                self.post_message(session, "Gemini", response.text) # Show original response
+        else:
+            self.post_message(session, "Gemini", response.text)
 
-        except Exception as e:
-            self.add_message_to_display("Error", f"Ein Fehler ist aufgetreten: {e}")
-        finally:
-            self.send_button.configure(state="normal")
+        try:
+            self.save_chat_history(session)
+        except OSError as e:
+            self.post_message(session, "System", f"Fehler beim Speichern des Chats: {e}")
+        if session.project is self.current_project:
+            self.update_chat_history_menu()
 
 
 if __name__ == "__main__":
+    # Daemon mode: reuse the running background daemon, it already has its API key
+    client = assistant_daemon.connect() if os.getenv("ASSISTANT_DAEMON") == "1" else None
+
+    api_key = None
+    if not client and model_backends.needs_api_key():
+        api_key = get_api_key()
+
     # A check to ensure the API key is available before starting the app
-    if not API_KEY:
+    if not client and model_backends.needs_api_key() and not api_key:
         print("Gemini API Key not found. Exiting.")
     else:
-        app = ProjectAssistantApp()
-        app.mainloop()
\ No newline at end of file
+        if not client and os.getenv("ASSISTANT_DAEMON") == "1":
+            env = dict(os.environ)
+            if api_key:
+                env["GEMINI_API_KEY"] = api_key
+            client = assistant_daemon.connect_or_start(env)
+            if not client:
+                print("Hintergrunddienst konnte nicht gestartet werden, starte ohne.")
+
+        if client:
+            app = ProjectAssistantApp(client.create_router(), client)
+        else:
+            app = ProjectAssistantApp(model_backends.create_router_from_env(api_key))
+        app.mainloop()
@@ -0,0 +1,259 @@
+import csv
+import os
+import json
+import re
+
+
+# --- GUI-free core of the project assistant ---
+# Everything in here only touches the filesystem and plain Python data, so it can
+# be used (and benchmarked) without a Tk display or a Gemini API key.
+
+CHAT_DIR_NAME = ".chats"
+TODO_FILE_NAME = "TODO.md"
+PROJECT_PHOTO_NAME = "project_photo.png"
+
+FILE_LIST_KEYWORDS = ["dateien", "files", "verzeichnis", "directory", "liste"]
+READ_FILE_LIMIT = 4000
+
+CODE_BLOCK_START = "---START_CODE_BLOCK---"
+CODE_BLOCK_END = "---END_CODE_BLOCK---"
+
+
+# --- Projects ---
+
+def read_projects_csv(csv_path):
+    with open(csv_path, mode='r', newline='', encoding='utf-8') as csvfile:
+        return list(csv.DictReader(csvfile))
+
+
+def scan_project_dir(project_path):
+    # Returns the sorted directory listing as (name, full_path, is_dir) tuples
+    entries = []
+    for item in sorted(os.listdir(project_path)):
+        item_path = os.path.join(project_path, item)
+        entries.append((item, item_path, os.path.isdir(item_path)))
+    return entries
+
+
+def find_last_modified_file(project_path):
+    last_mod_file, last_mod_time = "", 0
+    for item in os.listdir(project_path):
+        item_path = os.path.join(project_path, item)
+        if os.path.isfile(item_path):
+            mod_time = os.path.getmtime(item_path)
+            if mod_time > last_mod_time:
+                last_mod_time = mod_time
+                last_mod_file = item
+    return last_mod_file, last_mod_time
+
+
+# --- Chat history ---
+
+def get_chat_dir(project_path):
+    return os.path.join(project_path, CHAT_DIR_NAME)
+
+
+def list_chat_files(project_path):
+    chat_dir = get_chat_dir(project_path)
+    if not os.path.exists(chat_dir):
+        return []
+
+    files = [f for f in os.listdir(chat_dir) if f.endswith(".json")]
+    # Sort by creation time, newest first
+    files.sort(key=lambda f: os.path.getctime(os.path.join(chat_dir, f)), reverse=True)
+    return files
+
+
+def write_chat_history(chat_file, history):
+    chat_dir = os.path.dirname(chat_file)
+    if not os.path.exists(chat_dir):
+        os.makedirs(chat_dir)
+
+    with open(chat_file, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+
+def read_chat_history(chat_file):
+    with open(chat_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def history_to_messages(history):
+    # Yields (sender, text) pairs for displaying a loaded history
+    for message in history:
+        sender = "Sie" if message['role'] == 'user' else "Gemini"
+        yield sender, "".join(part['text'] for part in message['parts'])
+
+
+# --- Markdown ---
+# parse_markdown turns a chat message into a flat list of render operations:
+#   ("text", text, tag)   -> insert text (tag may be None)
+#   ("code", content)     -> embed a code block widget
+
+def parse_markdown(message):
+    ops = []
+    lines = message.split('\n')
+    in_code_block = False
+    code_block_content = ""
+
+    for line in lines:
+        if line.strip() == '```':
+            if in_code_block:
+                # End of code block
+                ops.append(("code", code_block_content))
+                in_code_block = False
+                code_block_content = ""
+            else:
+                # Start of code block
+                in_code_block = True
+            continue
+
+        if in_code_block:
+            code_block_content += line + '\n'
+        else:
+            parse_markdown_line(line, ops)
+
+    return ops
+
+
+def parse_markdown_line(line, ops):
+    if line.startswith("### "):
+        ops.append(("text", line[4:] + "\n", "h3"))
+        return
+    elif line.startswith("## "):
+        ops.append(("text", line[3:] + "\n", "h2"))
+        return
+    elif line.startswith("# "):
+        ops.append(("text", line[2:] + "\n", "h1"))
+        return
+
+    list_prefix = ""
+    content_line = line
+    if line.strip().startswith("* "):
+        list_prefix = "  • "
+        content_line = line.strip()[2:]
+    elif line.strip().startswith("- "):
+        list_prefix = "  • "
+        content_line = line.strip()[2:]
+    elif re.match(r"^\s*\d+\. ", line):
+        match = re.match(r"^(\s*\d+\. )", line)
+        list_prefix = f"  {match.group(1)}"
+        content_line = line[len(match.group(0)):]
+
+    if list_prefix:
+        ops.append(("text", list_prefix, None))
+
+    parts = re.split(r'(\**.*?\**|\*.*?\*|`.*?`)', content_line)
+    for part in parts:
+        if not part:
+            continue
+        if part.startswith('**') and part.endswith('**'):
+            ops.append(("text", part[2:-2], "bold"))
+        elif part.startswith('*') and part.endswith('*'):
+            ops.append(("text", part[1:-1], "italic"))
+        elif part.startswith('`') and part.endswith('`'):
+            ops.append(("text", part[1:-1], "code"))
+        else:
+            ops.append(("text", part, None))
+
+    ops.append(("text", "\n", None))
+
+
+# --- Prompt assembly ---
+
+def file_context_part(tracker, file_path, title, content):
+    # With a ContextTracker, files the model already knows are sent as a marker or diff
+    if tracker:
+        return tracker.file_part(os.path.abspath(file_path), title, content)
+    return f"\n--- {title} ---\n{content}"
+
+
+def build_context_parts(project, user_input, open_file=None, tracker=None):
+    # open_file is a (path, content) tuple for the file shown in the editor.
+    # tracker is the chat's context_tracker.ContextTracker (optional).
+    # Returns the context parts plus system notices that should be shown to the user.
+    context_parts = []
+    notices = []
+    if not project:
+        return context_parts, notices
+
+    # Add project context
+    context_parts.append(f"Kontext: Du bist ein Projekt-Assistent. Das aktuelle Projekt ist '{project['Projektname']}' im Verzeichnis '{project['Pfad']}'.")
+
+    # Tell the model about files changed in the working tree since the last turn
+    if tracker:
+        git_part = tracker.git_changes_part(project['Pfad'], exclude=[open_file[0]] if open_file else [])
+        if git_part:
+            context_parts.append(git_part)
+
+    # Add content of the currently edited file to the context
+    if open_file:
+        file_path, file_content = open_file
+        context_parts.append(file_context_part(tracker, file_path, f"Aktuell geöffnete Datei: {os.path.basename(file_path)}", file_content))
+
+    # Add file list to context if requested
+    if any(keyword in user_input.lower() for keyword in FILE_LIST_KEYWORDS):
+        try:
+            project_path = project['Pfad']
+            if os.path.isdir(project_path):
+                items = os.listdir(project_path)
+                files = [f for f in items if os.path.isfile(os.path.join(project_path, f))]
+                dirs = [d for d in items if os.path.isdir(os.path.join(project_path, d))]
+
+                file_list_str = "\n--- Verzeichnisinhalt ---\n"
+                if dirs:
+                    file_list_str += "Ordner:\n" + "\n".join(f"- {d}" for d in sorted(dirs)) + "\n"
+                if files:
+                    file_list_str += "Dateien:\n" + "\n".join(f"- {f}" for f in sorted(files)) + "\n"
+                context_parts.append(file_list_str)
+            else:
+                context_parts.append("\n[System-Hinweis: Der Projektpfad ist ungültig.]")
+        except Exception as e:
+            context_parts.append(f"\n[System-Hinweis: Fehler beim Lesen des Verzeichnisses: {e}]")
+
+    # Add file content to context if requested by command
+    if "lies die datei" in user_input.lower() or "read the file" in user_input.lower():
+        try:
+            # More robust filename parsing
+            parts = user_input.split()
+            filename_index = -1
+            for i, part in enumerate(parts):
+                if part == "datei" or part == "file":
+                    if i + 1 < len(parts):
+                        filename_index = i + 1
+                        break
+
+            if filename_index != -1:
+                filename = parts[filename_index]
+                filepath = os.path.join(project['Pfad'], filename)
+                if os.path.exists(filepath) and os.path.isfile(filepath):
+                    with open(filepath, 'r', encoding='utf-8') as f:
+                        file_content = f.read(READ_FILE_LIMIT) # Limit size
+                    context_parts.append(file_context_part(tracker, filepath, f"Inhalt von {filename}", file_content))
+                    if len(file_content) == READ_FILE_LIMIT:
+                        context_parts.append("\n[... Datei wurde gekürzt ...]")
+                else:
+                    notices.append(f"Datei nicht gefunden oder ist ein Verzeichnis: {filename}")
+            else:
+                notices.append("Konnte den Dateinamen im Befehl nicht finden.")
+        except Exception as e:
+            notices.append(f"Fehler beim Lesen der Datei: {e}")
+
+    return context_parts, notices
+
+
+def compose_prompt(context_parts, user_input):
+    # Combine context and the actual user query
+    final_prompt = "\n".join(context_parts)
+    if final_prompt:
+        final_prompt += f"\n\nAnfrage: {user_input}"
+    else:
+        final_prompt = user_input
+    return final_prompt
+
+
+def extract_code_block(response_text):
+    # Returns the new file content if Gemini sent back a full code block, else None
+    if CODE_BLOCK_START in response_text and CODE_BLOCK_END in response_text:
+        return response_text.split(CODE_BLOCK_START)[1].split(CODE_BLOCK_END)[0].strip()
+    return None
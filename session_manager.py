@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import itertools
+import threading
+
+import projekt_core
+import context_tracker
+
+
+# --- Chat sessions ---
+# Several chats (possibly of different projects) can be open at once. Each
+# LiveSession has its own model chat, context tracker, transcript and at most one
+# request in flight. Requests run on background threads; completions are handed
+# back to the Tk thread through post_to_ui. Idle sessions beyond the limits are
+# hibernated: their history already lives in the chat file, so only the in-memory
+# state is dropped and rebuilt from disk when the session is activated again.
+
+MAX_LIVE_SESSIONS = 4
+MAX_LIVE_CHARS = 4_000_000
+
+
+class LiveSession:
+    ids = itertools.count(1)
+
+    def __init__(self, project, chat_file):
+        self.id = next(self.ids)
+        self.project = project
+        self.chat_file = chat_file
+        self.chat = None
+        self.tracker = context_tracker.ContextTracker()
+        self.transcript = []   # (sender, message) pairs shown in the chat display
+        self.in_flight = False
+        self.unread = False
+        self.hibernated = True
+        self.loading = False   # showing a saved transcript while the history loads
+        self.saved_turns = 0   # length of the history as last read from / written to the chat file
+        self.last_active = time.time()
+
+    def title(self):
+        name = os.path.basename(self.chat_file)
+        if name.startswith("chat_") and name.endswith(".json"):
+            # chat_2024-01-31_12-00-00.json -> 2024-01-31 12:00
+            name = name[5:-5].replace("_", " ")[:16]
+            name = name[:11] + name[11:].replace("-", ":")
+        return f"{self.project['Projektname']} · {name}"
+
+    def read_history(self):
+        # Only file I/O, so it may run on a background thread. Returns (history, transcript).
+        history = []
+        transcript = []
+        if os.path.exists(self.chat_file):
+            try:
+                history = projekt_core.read_chat_history(self.chat_file)
+                transcript.append(("System", f"Chat '{os.path.basename(self.chat_file)}' geladen."))
+                transcript.extend(projekt_core.history_to_messages(history))
+            except (OSError, json.JSONDecodeError, KeyError, TypeError) as e:
+                history = []
+                transcript = [("System", f"Fehler beim Laden des Chats: {e}")]
+        return history, transcript
+
+    def wake(self, router, loaded=None):
+        # loaded: the result of read_history() if it already ran in the background
+        history, self.transcript = loaded or self.read_history()
+        self.chat = router.start_chat(history=history)
+        self.saved_turns = len(history)
+        self.tracker.reset()
+        self.hibernated = False
+        self.loading = False
+
+    def preview(self, transcript):
+        # Warm start: shows a saved transcript until wake() loaded the history
+        self.transcript = [tuple(message) for message in transcript]
+        self.loading = True
+
+    def hibernate(self):
+        # Only idle sessions; the history was written after the last completed request
+        self.save_history()
+        self.chat = None
+        self.transcript = []
+        self.tracker.reset()
+        self.hibernated = True
+
+    def save_history(self):
+        # Only if turns were added since, so an unchanged session neither overwrites
+        # newer turns another window wrote to the same chat nor touches the file
+        if self.chat and len(self.chat.history) != self.saved_turns:
+            projekt_core.write_chat_history(self.chat_file, self.chat.history)
+            self.saved_turns = len(self.chat.history)
+
+    def memory_chars(self):
+        # Rough in-memory size: history, rendered transcript and tracked file contents
+        if self.hibernated:
+            return 0
+        # A request thread may be appending to the history and committing the
+        # tracker; tuple() copies both in one step under the GIL
+        size = sum(len(part['text']) for message in tuple(self.chat.history) for part in message['parts'])
+        size += sum(len(message) for _, message in self.transcript)
+        size += sum(len(content) for _, content in tuple(self.tracker.seen.values()))
+        return size
+
+
+class SessionManager:
+    def __init__(self, router, post_to_ui, max_live_sessions=MAX_LIVE_SESSIONS, max_live_chars=MAX_LIVE_CHARS):
+        self.router = router
+        self.post_to_ui = post_to_ui
+        self.max_live_sessions = max_live_sessions
+        self.max_live_chars = max_live_chars
+        self.sessions = []
+        self.active = None
+
+    def find(self, chat_file):
+        chat_file = os.path.normcase(os.path.abspath(chat_file))
+        for session in self.sessions:
+            if os.path.normcase(os.path.abspath(session.chat_file)) == chat_file:
+                return session
+        return None
+
+    def latest_for_project(self, project):
+        candidates = [s for s in self.sessions if s.project['Projektname'] == project['Projektname']]
+        return max(candidates, key=lambda s: s.last_active) if candidates else None
+
+    def open(self, project, chat_file):
+        # Returns the existing session for chat_file or a new (hibernated) one
+        session = self.find(chat_file)
+        if not session:
+            session = LiveSession(project, chat_file)
+            self.sessions.append(session)
+        return session
+
+    def activate(self, session):
+        if session.hibernated and not session.loading:
+            session.wake(self.router)
+        session.last_active = time.time()
+        session.unread = False
+        self.active = session
+        self.enforce_limits()
+
+    def close(self, session):
+        if session.in_flight:
+            return False
+        session.save_history()
+        self.sessions.remove(session)
+        if self.active is session:
+            self.active = None
+        return True
+
+    def enforce_limits(self):
+        # Hibernate the least recently used idle sessions until both limits hold
+        live = [s for s in self.sessions if not s.hibernated]
+        total = sum(s.memory_chars() for s in live)
+        idle = sorted((s for s in live if s is not self.active and not s.in_flight), key=lambda s: s.last_active)
+        hibernated = []
+        while idle and (len(live) > self.max_live_sessions or total > self.max_live_chars):
+            session = idle.pop(0)
+            total -= session.memory_chars()
+            session.hibernate()
+            live.remove(session)
+            hibernated.append(session)
+        return hibernated
+
+    def run_request(self, session, work, on_done):
+        # work() runs on a background thread, on_done(session, result, error) on the Tk thread
+        session.in_flight = True
+
+        def worker():
+            try:
+                result, error = work(), None
+            except Exception as e:
+                result, error = None, e
+            self.post_to_ui(self.finish_request, session, result, error, on_done)
+
+        threading.Thread(target=worker, name=f"chat-session-{session.id}", daemon=True).start()
+
+    def finish_request(self, session, result, error, on_done):
+        session.in_flight = False
+        session.last_active = time.time()
+        if session is not self.active:
+            session.unread = True
+        try:
+            on_done(session, result, error)
+        finally:
+            self.enforce_limits()
@@ -0,0 +1,133 @@
+import os
+import json
+import base64
+
+import projekt_core
+import autosave
+
+
+# --- Warm start ---
+# On exit the app writes a snapshot of what was on screen: the selected project,
+# the open chat and its scroll position, the open file and the active tab, plus the
+# view data needed to draw them again without scanning (file listing, chat list,
+# last modified file, photo thumbnail and chat transcript). On the next launch the
+# UI is restored from the snapshot right away; validate() then compares the view
+# data with the disk on a background thread and reports the parts to redraw.
+
+STATE_FILE = ".session_state.json"
+STATE_VERSION = 1
+
+# Longer transcripts are stored as their newest part and reloaded in full later
+MAX_TRANSCRIPT_CHARS = 1_000_000
+
+
+def transcript_tail(transcript, max_chars=MAX_TRANSCRIPT_CHARS):
+    # Returns (newest messages within max_chars, complete?)
+    tail = []
+    size = 0
+    for sender, message in reversed(transcript):
+        size += len(message)
+        if size > max_chars:
+            break
+        tail.append([sender, message])
+    tail.reverse()
+    return tail, len(tail) == len(transcript)
+
+
+def photo_signature(project_path):
+    return autosave.file_signature(os.path.join(project_path, projekt_core.PROJECT_PHOTO_NAME))
+
+
+def make_view(workspace, project_path):
+    # Collects the view data of a project from the workspace cache. The thumbnail is
+    # only included if it was already decoded, so exiting never waits for a decode.
+    _, thumbnail = workspace.peek_thumbnail(os.path.join(project_path, projekt_core.PROJECT_PHOTO_NAME))
+    return {
+        "path": project_path,
+        "files": [list(entry) for entry in workspace.scan_project(project_path)],
+        "chats": list(workspace.chat_files(project_path)),
+        "last_modified": workspace.last_modified_file(project_path)[0],
+        "thumbnail": base64.b64encode(thumbnail).decode("ascii") if thumbnail else None,
+        "photo_signature": photo_signature(project_path),
+    }
+
+
+def save(state, path=STATE_FILE):
+    state = dict(state, v=STATE_VERSION)
+    autosave.atomic_write(path, json.dumps(state, ensure_ascii=False, separators=(",", ":")))
+
+
+def load(path=STATE_FILE):
+    # Returns the snapshot or None if there is none or it cannot be used
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if not is_valid(state):
+            return None
+        thumbnail_bytes(state["view"])
+    except (OSError, ValueError):
+        return None
+    return state
+
+
+def is_valid(state):
+    # The file may be truncated or edited by hand; startup indexes into it blindly
+    def strings(*values):
+        return all(isinstance(value, str) for value in values)
+
+    def optional_string(value):
+        return value is None or isinstance(value, str)
+
+    if not isinstance(state, dict) or state.get("v") != STATE_VERSION:
+        return False
+    project, view, chat = state.get("project"), state.get("view"), state.get("chat")
+    if not isinstance(project, dict) or not strings(project.get("Projektname"), project.get("Pfad")):
+        return False
+    if not optional_string(state.get("tab")) or not optional_string(state.get("open_file")):
+        return False
+    if not isinstance(view, dict) or not isinstance(view.get("path"), str):
+        return False
+    if not isinstance(view.get("files"), list) or not all(isinstance(entry, list) and len(entry) == 3 and strings(*entry[:2]) for entry in view["files"]):
+        return False
+    if not isinstance(view.get("chats"), list) or not strings(*view["chats"]):
+        return False
+    if not optional_string(view.get("last_modified")) or not optional_string(view.get("thumbnail")):
+        return False
+    if not (view.get("photo_signature") is None or isinstance(view["photo_signature"], list)):
+        return False
+    if chat is None:
+        return True
+    return (
+        isinstance(chat, dict) and isinstance(chat.get("file"), str)
+        and isinstance(chat.get("transcript"), list)
+        and all(isinstance(message, list) and len(message) == 2 and strings(*message) for message in chat["transcript"])
+        and isinstance(chat.get("complete"), bool)
+        and isinstance(chat.get("scroll"), (int, float))
+        and (chat.get("signature") is None or isinstance(chat["signature"], list))
+    )
+
+
+def thumbnail_bytes(view):
+    return base64.b64decode(view["thumbnail"]) if view.get("thumbnail") else None
+
+
+def validate(workspace, state):
+    # Runs on a background thread. Returns the names of the outdated parts:
+    # "project", "files", "chats", "info" and "chat".
+    view = state["view"]
+    project_path = view["path"]
+    if not os.path.isdir(project_path):
+        return {"project"}
+
+    stale = set()
+    if [list(entry) for entry in workspace.scan_project(project_path)] != view["files"]:
+        stale.add("files")
+    if list(workspace.chat_files(project_path)) != view["chats"]:
+        stale.add("chats")
+    if workspace.last_modified_file(project_path)[0] != view["last_modified"] or list(photo_signature(project_path) or []) != list(view["photo_signature"] or []):
+        stale.add("info")
+
+    chat = state.get("chat")
+    if chat and (not chat["complete"] or list(autosave.file_signature(chat["file"]) or []) != list(chat["signature"] or [])):
+        stale.add("chat")
+    return stale
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import contextlib
+import zlib
+import hashlib
+import threading
+
+
+# --- Snapshot store ---
+# Per-project, content-addressed store of file versions taken right before the
+# assistant (or the user) overwrites a file. Blobs are zlib-compressed and named by
+# the SHA-256 of their content, so identical versions are stored once. A compact
+# JSON index maps relative paths to their version list:
+#   {"v": 1, "files": {"src/main.py": [[timestamp, hash, size, source], ...]},
+#    "blobs": {hash: compressed_size}}
+# Storage is bounded by a per-file version limit and a total byte budget; the
+# oldest versions are evicted first and unreferenced blobs are deleted.
+#
+# Several windows (or the daemon's clients) may share a project. Every change runs
+# load -> modify -> save while holding an index.lock file created with O_EXCL, and
+# the index is read again whenever its signature on disk changed since we last read
+# or wrote it.
+
+SNAPSHOT_DIR_NAME = ".snapshots"
+INDEX_VERSION = 1
+
+MAX_VERSIONS_PER_FILE = 30
+MAX_TOTAL_BYTES = 64 * 1024 * 1024
+MAX_FILE_BYTES = 16 * 1024 * 1024
+
+LOCK_TIMEOUT = 10.0
+# A lock file this old was left behind by a crashed process
+LOCK_STALE_SECONDS = 60.0
+
+SOURCE_LABELS = {
+    "open": "Original",
+    "manual": "Manuell",
+    "ai": "KI",
+    "restore": "Vor Wiederherstellung",
+    "unsaved": "Nicht gespeichert",
+}
+
+
+def blob_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, project_path, max_versions_per_file=MAX_VERSIONS_PER_FILE, max_total_bytes=MAX_TOTAL_BYTES):
+        self.project_path = os.path.abspath(project_path)
+        self.root = os.path.join(self.project_path, SNAPSHOT_DIR_NAME)
+        self.index_path = os.path.join(self.root, "index.json")
+        self.lock_path = os.path.join(self.root, "index.lock")
+        self.max_versions_per_file = max_versions_per_file
+        self.max_total_bytes = max_total_bytes
+        self.lock = threading.Lock()
+        self.files = None
+        self.blobs = None
+        self.index_signature = None
+
+    # --- Index ---
+
+    def index_stat(self):
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load_index(self):
+        # Called with the lock held, before every read and every change
+        signature = self.index_stat()
+        if self.files is not None and signature == self.index_signature:
+            return
+        self.index_signature = signature
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("v") != INDEX_VERSION:
+                raise ValueError("unbekannte Index-Version")
+            self.files = data["files"]
+            self.blobs = data["blobs"]
+        except (FileNotFoundError, ValueError, KeyError, AttributeError):
+            self.files = {}
+            self.blobs = {}
+
+    def save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"v": INDEX_VERSION, "files": self.files, "blobs": self.blobs}, f, separators=(",", ":"), ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+        self.index_signature = self.index_stat()
+
+    @contextlib.contextmanager
+    def index_lock(self):
+        # Cross-process lock around changes of the index; raises TimeoutError
+        os.makedirs(self.root, exist_ok=True)
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE_SECONDS:
+                        os.remove(self.lock_path)
+                        continue
+                except OSError:
+                    continue # Released in the meantime
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Snapshot-Index ist gesperrt ({self.lock_path}).")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(self.lock_path)
+            except OSError:
+                pass
+
+    def relpath(self, path):
+        return os.path.relpath(os.path.abspath(path), self.project_path).replace(os.sep, "/")
+
+    # --- Blobs ---
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest[2:] + ".z")
+
+    def write_blob(self, digest, data):
+        path = self.blob_path(digest)
+        if digest in self.blobs and os.path.exists(path):
+            return
+        compressed = zlib.compress(data, 6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+        self.blobs[digest] = len(compressed)
+
+    def read_blob(self, digest):
+        with open(self.blob_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if blob_hash(data) != digest:
+            raise ValueError(f"Snapshot {digest[:12]} ist beschädigt.")
+        return data
+
+    # --- Public API ---
+
+    def capture(self, path, source="manual"):
+        # Stores the current on-disk content of path. Returns the hash or None.
+        try:
+            if os.path.getsize(path) > MAX_FILE_BYTES:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        return self.store(path, data, source)
+
+    def capture_text(self, path, text, source="unsaved", encoding="utf-8"):
+        # Stores content that never reached the disk, e.g. edits lost to a conflict
+        return self.store(path, text.encode(encoding), source)
+
+    def store(self, path, data, source):
+        if len(data) > MAX_FILE_BYTES:
+            return None
+        digest = blob_hash(data)
+        with self.lock, self.index_lock():
+            self.load_index()
+            rel = self.relpath(path)
+            versions = self.files.setdefault(rel, [])
+            if versions and versions[-1][1] == digest:
+                return digest # Unchanged since the last snapshot
+            self.write_blob(digest, data)
+            versions.append([round(time.time(), 3), digest, len(data), source])
+            self.evict()
+            self.save_index()
+        return digest
+
+    def versions(self, path):
+        # Newest first, as dicts
+        with self.lock:
+            self.load_index()
+            entries = self.files.get(self.relpath(path), [])
+            return [
+                {"time": entry[0], "hash": entry[1], "size": entry[2], "source": entry[3]}
+                for entry in reversed(entries)
+            ]
+
+    def restore(self, digest, encoding="utf-8"):
+        # Returns the content of a version; writing it back is up to the caller
+        with self.lock:
+            return self.read_blob(digest).decode(encoding)
+
+    # --- Eviction ---
+
+    def evict(self):
+        for versions in self.files.values():
+            if len(versions) > self.max_versions_per_file:
+                del versions[:len(versions) - self.max_versions_per_file]
+
+        refcounts = {}
+        for versions in self.files.values():
+            for entry in versions:
+                refcounts[entry[1]] = refcounts.get(entry[1], 0) + 1
+        total = sum(self.blobs.get(digest, 0) for digest in refcounts)
+
+        if total > self.max_total_bytes:
+            # Drop the globally oldest versions, but keep the newest version of every file
+            candidates = sorted(
+                (entry[0], rel, entry)
+                for rel, versions in self.files.items()
+                for entry in versions[:-1]
+            )
+            for _, rel, entry in candidates:
+                if total <= self.max_total_bytes:
+                    break
+                self.files[rel].remove(entry)
+                refcounts[entry[1]] -= 1
+                if refcounts[entry[1]] == 0:
+                    total -= self.blobs.get(entry[1], 0)
+
+        for rel in [rel for rel, versions in self.files.items() if not versions]:
+            del self.files[rel]
+        self.collect_garbage({digest for digest, count in refcounts.items() if count > 0})
+
+    def collect_garbage(self, referenced):
+        for digest in [digest for digest in self.blobs if digest not in referenced]:
+            try:
+                os.remove(self.blob_path(digest))
+            except OSError:
+                pass
+            del self.blobs[digest]
@@ -0,0 +1,153 @@
+import os
+import re
+import json
+import threading
+
+import projekt_core
+import autosave
+
+
+# --- Cross-project task index ---
+# Parses the checkbox items of every project's TODO.md into one store. The store is
+# persisted next to projekte.csv so the dashboard can show it instantly on start;
+# a background refresh then only re-reads TODO.md files whose mtime/size changed.
+
+INDEX_FILE = ".task_index.json"
+INDEX_VERSION = 1
+
+STATUS_OPEN = "Offen"
+STATUS_DONE = "Erledigt"
+
+TASK_PATTERN = re.compile(r"^\s*[-*+]\s+\[([ xX])\]\s+(.*?)\s*$")
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.*?)\s*$")
+
+
+def parse_todo(text):
+    tasks = []
+    section = ""
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            section = heading.group(1)
+            continue
+        match = TASK_PATTERN.match(line)
+        if match:
+            tasks.append({
+                "text": match.group(2),
+                "done": match.group(1) != " ",
+                "section": section,
+                "line": line_number,
+            })
+    return tasks
+
+
+class TaskIndex:
+    def __init__(self, index_path=INDEX_FILE):
+        self.index_path = index_path
+        self.lock = threading.Lock()
+        self.refresh_thread = None
+        # Projektname -> {"path", "typ", "mtime", "size", "tasks"}
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self.entries = data.get("projects", {})
+        except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+            self.entries = {}
+
+    def save(self):
+        # atomic_write uses a unique temp file, so two windows sharing the index
+        # (local mode) can save at the same time
+        with self.lock:
+            text = json.dumps({"version": INDEX_VERSION, "projects": self.entries}, ensure_ascii=False)
+        autosave.atomic_write(self.index_path, text)
+
+    def refresh_project(self, project):
+        # Returns True if the project's tasks changed
+        name = project['Projektname']
+        todo_path = os.path.join(project['Pfad'], projekt_core.TODO_FILE_NAME)
+        try:
+            stat = os.stat(todo_path)
+        except OSError:
+            with self.lock:
+                return self.entries.pop(name, None) is not None
+
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry and entry["path"] == todo_path and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                if entry.get("typ") != project.get('Typ', ""):
+                    entry["typ"] = project.get('Typ', "")
+                    return True
+                return False
+
+        try:
+            with open(todo_path, "r", encoding="utf-8") as f:
+                tasks = parse_todo(f.read())
+        except (OSError, UnicodeDecodeError):
+            return False
+
+        with self.lock:
+            self.entries[name] = {
+                "path": todo_path,
+                "typ": project.get('Typ', ""),
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "tasks": tasks,
+            }
+        return True
+
+    def refresh(self, projects):
+        changed = False
+        for project in projects:
+            if self.refresh_project(project):
+                changed = True
+
+        known = {project['Projektname'] for project in projects}
+        with self.lock:
+            for name in [name for name in self.entries if name not in known]:
+                del self.entries[name]
+                changed = True
+
+        if changed:
+            self.save()
+        return changed
+
+    def refresh_in_background(self, projects, on_done=None):
+        # on_done(changed, error) is called from the worker thread, also if the
+        # refresh failed (e.g. the index cannot be written)
+        if self.refresh_thread and self.refresh_thread.is_alive():
+            return False
+
+        def worker():
+            try:
+                changed, error = self.refresh(projects), None
+            except Exception as e:
+                changed, error = False, e
+            if on_done:
+                on_done(changed, error)
+
+        self.refresh_thread = threading.Thread(target=worker, name="task-index", daemon=True)
+        self.refresh_thread.start()
+        return True
+
+    def query(self, project=None, typ=None, status=None):
+        # Returns (projektname, typ, task) tuples; None means "no filter"
+        results = []
+        with self.lock:
+            for name in sorted(self.entries):
+                entry = self.entries[name]
+                if project and name != project:
+                    continue
+                if typ and entry.get("typ") != typ:
+                    continue
+                for task in entry["tasks"]:
+                    if status == STATUS_OPEN and task["done"]:
+                        continue
+                    if status == STATUS_DONE and not task["done"]:
+                        continue
+                    results.append((name, entry.get("typ", ""), task))
+        return results
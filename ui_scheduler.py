@@ -0,0 +1,82 @@
+import time
+import itertools
+
+
+# --- UI work scheduler ---
+# Widget-heavy updates are written as generators: every `yield` marks a point where
+# the work may be paused. The scheduler advances the queued generators through
+# after() callbacks, spending at most budget_ms per frame so the Tk event loop can
+# redraw and react to input in between. Jobs belong to a group; submitting a new
+# job for a group drops the one still running there, e.g. the file tree of the
+# previously selected project.
+
+PRIORITY_VISIBLE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+FRAME_BUDGET_MS = 12
+TICK_INTERVAL_MS = 1
+
+
+class UIJob:
+    def __init__(self, group, iterator, priority, order, on_done):
+        self.group = group
+        self.iterator = iterator
+        self.priority = priority
+        self.order = order
+        self.on_done = on_done
+
+
+class UIScheduler:
+    def __init__(self, widget, budget_ms=FRAME_BUDGET_MS):
+        self.widget = widget
+        self.budget = budget_ms / 1000.0
+        self.jobs = {}   # group -> UIJob
+        self.counter = itertools.count()
+        self.tick_id = None
+
+    def submit(self, group, iterator, priority=PRIORITY_NORMAL, on_done=None):
+        self.cancel(group)
+        self.jobs[group] = UIJob(group, iterator, priority, next(self.counter), on_done)
+        if self.tick_id is None:
+            self.tick_id = self.widget.after(TICK_INTERVAL_MS, self.tick)
+
+    def cancel(self, group):
+        job = self.jobs.pop(group, None)
+        if job and hasattr(job.iterator, "close"):
+            job.iterator.close()
+
+    def set_priority(self, group, priority):
+        if group in self.jobs:
+            self.jobs[group].priority = priority
+
+    def run_now(self, group):
+        # Finishes a job synchronously, e.g. before its widgets are needed
+        job = self.jobs.get(group)
+        while job and self.jobs.get(group) is job:
+            self.step(job)
+
+    def step(self, job):
+        try:
+            next(job.iterator)
+        except StopIteration:
+            if self.jobs.get(job.group) is job:
+                del self.jobs[job.group]
+            if job.on_done:
+                job.on_done()
+        except Exception:
+            if self.jobs.get(job.group) is job:
+                del self.jobs[job.group]
+            raise
+
+    def tick(self):
+        self.tick_id = None
+        deadline = time.perf_counter() + self.budget
+        try:
+            while self.jobs and time.perf_counter() < deadline:
+                # Highest priority first, oldest first within a priority
+                job = min(self.jobs.values(), key=lambda j: (j.priority, j.order))
+                self.step(job)
+        finally:
+            if self.jobs and self.tick_id is None:
+                self.tick_id = self.widget.after(TICK_INTERVAL_MS, self.tick)
@@ -0,0 +1,149 @@
+import io
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import projekt_core
+import task_index
+
+
+# --- Workspace cache ---
+# Caches the results of the filesystem scans behind the UI: projekte.csv, project
+# directory listings, chat lists, the last modified file, project photo thumbnails
+# and the task index. Listings are validated with a single stat() of their
+# directory (its mtime changes when entries are added, removed or renamed), so a
+# cached project on Google Drive costs one stat instead of a stat per entry.
+#
+# The same class is used inside the app (local mode) and inside the shared daemon
+# (see assistant_daemon), where all windows share one instance.
+
+# Content changes of a file do not touch the directory mtime, so the "last
+# modified file" is only cached for a short while
+LAST_MODIFIED_TTL = 30.0
+THUMBNAIL_SIZE = (520, 300)   # 2x the info panel photo, for HiDPI scaling
+THUMBNAIL_CACHE_SIZE = 64
+
+
+def stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def make_thumbnail(photo_path):
+    # Decodes and downscales a photo to PNG bytes; raises ValueError if that fails.
+    # Imported here so the cache (and the benchmarks) work without Pillow
+    from PIL import Image
+    try:
+        with Image.open(photo_path) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            if img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                img = img.convert("RGB") # e.g. CMYK JPEGs, which PNG cannot store
+            output = io.BytesIO()
+            img.save(output, format="PNG")
+    except OSError as e:
+        raise ValueError(str(e)) from e
+    return output.getvalue()
+
+
+class WorkspaceCache:
+    def __init__(self, task_index_path=task_index.INDEX_FILE):
+        self.lock = threading.Lock()
+        self.listings = {}     # (kind, path) -> (signature, value)
+        self.last_modified = {}  # path -> (timestamp, value)
+        self.thumbnails = OrderedDict()  # (path, signature) -> PNG bytes, LRU order
+        self.task_index = task_index.TaskIndex(os.path.abspath(task_index_path))
+        self.task_refresh_lock = threading.Lock()
+
+    def cached(self, kind, path, signature_path, load):
+        # Returns the cached value for path while signature_path's signature is unchanged
+        key = (kind, os.path.abspath(path))
+        signature = stat_signature(signature_path)
+        with self.lock:
+            entry = self.listings.get(key)
+            if entry and signature is not None and entry[0] == signature:
+                return entry[1]
+        value = load()
+        with self.lock:
+            self.listings[key] = (signature, value)
+        return value
+
+    def invalidate(self, path):
+        # Call after writing into a project, e.g. creating a chat file
+        path = os.path.abspath(path)
+        with self.lock:
+            for key in [key for key in self.listings if key[1] == path or key[1].startswith(path + os.sep)]:
+                del self.listings[key]
+            self.last_modified.pop(path, None)
+
+    # --- Projects ---
+
+    def projects(self, csv_path):
+        return self.cached("projects", csv_path, csv_path, lambda: projekt_core.read_projects_csv(csv_path))
+
+    def scan_project(self, project_path):
+        return self.cached("scan", project_path, project_path, lambda: projekt_core.scan_project_dir(project_path))
+
+    def chat_files(self, project_path):
+        chat_dir = projekt_core.get_chat_dir(project_path)
+        return self.cached("chats", project_path, chat_dir, lambda: projekt_core.list_chat_files(project_path))
+
+    def last_modified_file(self, project_path):
+        key = os.path.abspath(project_path)
+        with self.lock:
+            entry = self.last_modified.get(key)
+            if entry and time.monotonic() - entry[0] < LAST_MODIFIED_TTL:
+                return entry[1]
+        value = projekt_core.find_last_modified_file(project_path)
+        with self.lock:
+            self.last_modified[key] = (time.monotonic(), value)
+        return value
+
+    # --- Thumbnails ---
+
+    def thumbnail(self, photo_path):
+        # Returns the downscaled photo as PNG bytes, or None if there is none.
+        # Decoding errors are raised as ValueError.
+        found, data = self.peek_thumbnail(photo_path)
+        if found:
+            return data
+        if stat_signature(photo_path) is None:
+            return None
+        data = make_thumbnail(photo_path)
+        self.put_thumbnail(photo_path, data)
+        return data
+
+    def peek_thumbnail(self, photo_path):
+        # Returns (found, PNG bytes or None) without decoding anything
+        signature = stat_signature(photo_path)
+        if signature is None:
+            return True, None
+        key = (os.path.abspath(photo_path), signature)
+        with self.lock:
+            if key in self.thumbnails:
+                self.thumbnails.move_to_end(key)
+                return True, self.thumbnails[key]
+        return False, None
+
+    def put_thumbnail(self, photo_path, data):
+        # For thumbnails decoded elsewhere, e.g. in the job system's worker processes
+        signature = stat_signature(photo_path)
+        if signature is None:
+            return
+        with self.lock:
+            self.thumbnails[(os.path.abspath(photo_path), signature)] = data
+            while len(self.thumbnails) > THUMBNAIL_CACHE_SIZE:
+                self.thumbnails.popitem(last=False)
+
+    # --- Tasks ---
+
+    def refresh_tasks(self, projects):
+        # Serialized, so two windows refreshing at once do not parse everything twice
+        with self.task_refresh_lock:
+            return self.task_index.refresh(projects)
+
+    def query_tasks(self, project=None, typ=None, status=None):
+        return self.task_index.query(project, typ, status)